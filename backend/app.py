@@ -5,14 +5,23 @@ import traceback
 import asyncio
 import re
 import requests
-from flask import Flask, request, jsonify, send_from_directory
+import threading
+from collections import OrderedDict
+from functools import partial
+from flask import Flask, request, jsonify, send_file, abort
 from flask_cors import CORS
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
 from dotenv import load_dotenv
 from services.image_analyzer import ImageAnalyzer
 from services.brand_data_manager import BrandDataManager
 from services.copy_generator import CopyGenerator
 from services.image_cropper import ImageCropper
+from services.analysis_cache import AnalysisCache
+from services.decoded_image import DecodedImage
+from services.word_store import WordStore
+from services.crop_gc import CropGarbageCollector
+from services.upload_store import UploadStore
 
 load_dotenv()
 
@@ -23,6 +32,10 @@ CORS(app)
 
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 app.config['UPLOAD_FOLDER'] = 'uploads'
+# Derived per-upload data (analysis cache, OCR words); never served
+app.config['DATA_FOLDER'] = os.getenv('DATA_FOLDER', 'data')
+# Hand file bodies to a fronting nginx/Apache instead of streaming them from Python
+app.config['USE_X_SENDFILE'] = os.getenv('USE_X_SENDFILE', 'false').lower() == 'true'
 
 # Ensure upload directory exists
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -32,6 +45,138 @@ image_analyzer = ImageAnalyzer()
 brand_data_manager = BrandDataManager()
 copy_generator = CopyGenerator()
 image_cropper = ImageCropper()
+upload_store = UploadStore(app.config['UPLOAD_FOLDER'])
+analysis_cache = AnalysisCache(os.path.join(app.config['DATA_FOLDER'], 'cache'))
+word_store = WordStore(os.path.join(app.config['DATA_FOLDER'], 'words'))
+# Every worker starts the thread, but only the one holding the crop folder's
+# collector lock ever collects
+crop_gc = CropGarbageCollector(image_cropper.crop_folder, word_store=word_store)
+crop_gc.start()
+
+# Recently decoded uploads, reused by recrop requests
+DECODED_UPLOAD_CACHE_SIZE = int(os.getenv('DECODED_UPLOAD_CACHE_SIZE', 2))
+decoded_uploads = OrderedDict()
+decoded_uploads_lock = threading.Lock()
+
+def load_decoded_upload(full_image_path):
+    """Decode an uploaded image, reusing a recent decode while the file is unchanged."""
+    stat = os.stat(full_image_path)
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with decoded_uploads_lock:
+        entry = decoded_uploads.get(full_image_path)
+        if entry and entry[0] == signature:
+            decoded_uploads.move_to_end(full_image_path)
+            return entry[1]
+
+    image = DecodedImage.open(full_image_path)
+    with decoded_uploads_lock:
+        decoded_uploads[full_image_path] = (signature, image)
+        decoded_uploads.move_to_end(full_image_path)
+        while len(decoded_uploads) > DECODED_UPLOAD_CACHE_SIZE:
+            decoded_uploads.popitem(last=False)
+    return image
+
+# Content hashes of uploads and crops, keyed by path and checked against size/mtime
+FILE_HASH_CACHE_SIZE = int(os.getenv('FILE_HASH_CACHE_SIZE', 4096))
+file_hashes = OrderedDict()
+file_hashes_lock = threading.Lock()
+
+def file_signature(full_path):
+    """(mtime, size, inode) of a file; an atomic replace changes the inode even within one mtime tick."""
+    stat = os.stat(full_path)
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+def file_content_hash(full_path):
+    """SHA-256 of an upload or crop file, hashed once per file version."""
+    signature = file_signature(full_path)
+    with file_hashes_lock:
+        entry = file_hashes.get(full_path)
+        if entry and entry[0] == signature:
+            file_hashes.move_to_end(full_path)
+            return entry[1]
+    digest = analysis_cache.hash_file(full_path)
+    remember_file_hash(full_path, digest, signature)
+    return digest
+
+def remember_file_hash(full_path, digest, signature=None):
+    """
+    Record a hash computed elsewhere (e.g. while the upload was saved).
+
+    Args:
+        full_path: File the digest was computed from
+        digest: SHA-256 hex digest
+        signature: file_signature taken before hashing; if the file has changed
+            since, the digest may be of the old or a partial file and is not kept
+    """
+    current = file_signature(full_path)
+    if signature is not None and signature != current:
+        return
+    with file_hashes_lock:
+        file_hashes[full_path] = (current, digest)
+        file_hashes.move_to_end(full_path)
+        while len(file_hashes) > FILE_HASH_CACHE_SIZE:
+            file_hashes.popitem(last=False)
+
+# Names written by UploadStore: the SHA-256 of the file's bytes
+CONTENT_HASHED_UPLOAD = re.compile(r'^[0-9a-f]{64}\.\w+$')
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+
+def send_cacheable(directory, filename, immutable):
+    """
+    Serve a file with a strong content ETag, 304 and Range handling.
+
+    Immutable files (content-hashed URLs) are cached by browsers for a year
+    without revalidation; others must revalidate, which costs a 304 when
+    unchanged. send_file streams through the server's file wrapper
+    (sendfile under gunicorn) or X-Sendfile when USE_X_SENDFILE is set.
+    """
+    full_path = safe_join(directory, filename)
+    if full_path is None or not os.path.isfile(full_path):
+        abort(404)
+    response = send_file(os.path.abspath(full_path), etag=file_content_hash(full_path),
+                         max_age=IMMUTABLE_MAX_AGE if immutable else 0)
+    response.cache_control.public = True
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+def assign_crop_images(sections, crop_paths):
+    """Set each section's crop_image to its crop path relative to the upload folder."""
+    for section in sections:
+        crop_path = crop_paths.get(section['id'])
+        # Convert to relative path for serving
+        section['crop_image'] = os.path.relpath(crop_path, app.config['UPLOAD_FOLDER']) if crop_path else None
+
+def plan_sprite_atlas(filename, image_size, sections, token, image=None):
+    """Lay out the upload's preview sprite atlas, with its path relative to the upload folder."""
+    atlas = image_cropper.plan_sprite_atlas(filename, image_size, sections, token, image)
+    if atlas is None:
+        return None
+    return {
+        'image': os.path.relpath(atlas.pop('path'), app.config['UPLOAD_FOLDER']),
+        **atlas
+    }
+
+def render_sprite_atlas(image, spec):
+    """
+    Render an upload's sprite atlas, re-planning its layout if it was evicted.
+
+    The layout file lives in the upload's crop directory, which the crop
+    collector may remove while the (immutable) atlas URL is still in use. The
+    layout is a pure function of the analyzed sections, so it is rebuilt from
+    the upload's cached analysis; a URL whose layout cannot be rebuilt 404s.
+    """
+    if not image_cropper.has_sprite_atlas_layout(spec):
+        source_path = os.path.join(app.config['UPLOAD_FOLDER'], spec['upload'])
+        cache_key = analysis_cache.make_key(source_path, image_analyzer.pipeline_params(),
+                                            file_content_hash(source_path))
+        cached = analysis_cache.get(cache_key)
+        if cached and cached.get('image_size'):
+            size = (cached['image_size']['width'], cached['image_size']['height'])
+            image_cropper.plan_sprite_atlas(spec['upload'], size, cached['sections'], spec['token'])
+    return image_cropper.render_sprite_atlas(image, spec)
 
 def process_sections_new_pipeline(sections, brand_data, additional_context, image_path):
     """Process all sections through the NEW 2-step pipeline"""
@@ -68,6 +213,35 @@ def process_sections_new_pipeline(sections, brand_data, additional_context, imag
             'error': str(e)
         }
 
+def crop_file_signature(relative_crop_path):
+    """Size and mtime of a crop file, used to detect crops rewritten by another upload"""
+    try:
+        stat = os.stat(os.path.join(app.config['UPLOAD_FOLDER'], relative_crop_path))
+        return [stat.st_size, stat.st_mtime_ns]
+    except OSError:
+        return None
+
+def restore_cached_crops(image_path, sections, crops):
+    """
+    Re-create crop files from cached crop metadata when they are missing or stale.
+    Returns True if any crop was re-created (and its metadata updated in place).
+    """
+    restored = False
+    image = None
+    for section in sections:
+        crop = crops.get(section.get('id'))
+        if not crop or not crop.get('crop_image'):
+            continue
+        signature = crop_file_signature(crop['crop_image'])
+        if signature is None or signature != crop.get('signature'):
+            image = image or load_decoded_upload(image_path)
+            crop_path = image_cropper.crop_section(image, section['id'], crop['bounding_box'])
+            section['crop_image'] = os.path.relpath(crop_path, app.config['UPLOAD_FOLDER']) if crop_path else None
+            crop['crop_image'] = section['crop_image']
+            crop['signature'] = crop_file_signature(section['crop_image']) if crop_path else None
+            restored = True
+    return restored
+
 # Health check endpoint
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -84,34 +258,77 @@ def analyze_image():
             return jsonify({'error': 'No file selected'}), 400
         
         if file:
-            filename = secure_filename(file.filename)
+            # Stored under the hash of its bytes, computed while saving; the same
+            # bytes under any name share one file and one stored analysis
+            filename, content_hash = upload_store.save(file)
             filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            
-            # Clean up any existing crops for this base filename
-            base_filename = os.path.splitext(filename)[0]
-            image_cropper.cleanup_crops(base_filename)
-            
-            # Analyze the image to identify sections
-            sections = image_analyzer.analyze_page_sections(filepath)
-            
-            # Crop section images
-            crop_paths = image_cropper.crop_all_sections(filepath, sections)
+            remember_file_hash(filepath, content_hash)
             
-            # Add crop paths to sections
-            for section in sections:
-                section_id = section['id']
-                if section_id in crop_paths:
-                    # Convert to relative path for serving
-                    crop_path = crop_paths[section_id]
-                    relative_crop_path = os.path.relpath(crop_path, app.config['UPLOAD_FOLDER'])
-                    section['crop_image'] = relative_crop_path
+            lazy_token = content_hash[:16]
+            cache_key = analysis_cache.make_key(filepath, image_analyzer.pipeline_params(), content_hash)
+            cached = analysis_cache.get(cache_key)
+            if cached:
+                print("⚡ Analysis cache hit - skipping segmentation, OCR and Gemini")
+                sections = cached['sections']
+                if not word_store.has(filepath):
+                    word_store.put(filepath, cached.get('text_elements', []), cached.get('image_size'))
+                if image_cropper.crop_mode == 'lazy' and cached.get('image_size'):
+                    # Lazy URLs are cheap to rebuild and must name this upload
+                    size = (cached['image_size']['width'], cached['image_size']['height'])
+                    assign_crop_images(sections, image_cropper.plan_lazy_crops(filename, size, sections, lazy_token))
+                elif restore_cached_crops(filepath, sections, cached.get('crops', {})):
+                    analysis_cache.put(cache_key, cached)
+                sprite_atlas = None
+                if cached.get('image_size'):
+                    size = (cached['image_size']['width'], cached['image_size']['height'])
+                    sprite_atlas = plan_sprite_atlas(filename, size, sections, lazy_token)
+            else:
+                # Clean up any existing crops of this upload
+                image_cropper.cleanup_crops(filename)
+                
+                # Decode once and share the pixels between analysis and cropping
+                image = load_decoded_upload(filepath)
+                
+                # Analyze the image to identify sections
+                analysis = image_analyzer.analyze_page(image)
+                sections = analysis['sections']
+                
+                # Keep the OCR words so recrops can re-map text without another OCR pass
+                if analysis['text_elements']:
+                    word_store.put(filepath, analysis['text_elements'], analysis['image_size'])
+                
+                # Crop section images (lazy mode only assigns URLs; crops render on first request)
+                if image_cropper.crop_mode == 'lazy':
+                    crop_paths = image_cropper.plan_lazy_crops(filename, image.size, sections, lazy_token)
                 else:
-                    section['crop_image'] = None
+                    crop_paths = image_cropper.crop_all_sections(image, sections)
+                
+                # Add crop paths to sections
+                assign_crop_images(sections, crop_paths)
+                
+                # One atlas of downscaled previews, so a page of previews is a single request
+                sprite_atlas = plan_sprite_atlas(filename, image.size, sections, lazy_token,
+                                                 image if image_cropper.crop_mode != 'lazy' else None)
+
+                if analysis['complete']:
+                    analysis_cache.put(cache_key, {
+                        'sections': sections,
+                        'text_elements': analysis['text_elements'],
+                        'image_size': analysis['image_size'],
+                        'crops': {
+                            section['id']: {
+                                'bounding_box': section.get('bounding_box'),
+                                'crop_image': section.get('crop_image'),
+                                'signature': crop_file_signature(section['crop_image']) if section.get('crop_image') else None
+                            }
+                            for section in sections
+                        }
+                    })
             
             return jsonify({
                 'success': True,
                 'sections': sections,
+                'sprite_atlas': sprite_atlas,
                 'image_path': filename  # Frontend will use this for copy generation
             })
     
@@ -182,14 +399,49 @@ def get_products(brand_name):
 
 @app.route('/uploads/<path:filename>')
 def serve_upload(filename):
-    """Serve uploaded files including cropped section images"""
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    """Serve uploaded files; content-hashed uploads are immutable"""
+    # Only the uploads themselves; crops have their own route below
+    if '/' in filename:
+        abort(404)
+    return send_cacheable(app.config['UPLOAD_FOLDER'], filename, bool(CONTENT_HASHED_UPLOAD.match(filename)))
 
 @app.route('/uploads/crops/<path:filename>')
 def serve_crop(filename):
-    """Serve cropped section images"""
+    """Serve cropped section images, rendering lazy crops on first access.
+
+    ?size=<pixels> serves the smallest pyramid level at least that large.
+    """
     crop_folder = os.path.join(app.config['UPLOAD_FOLDER'], 'crops')
-    return send_from_directory(crop_folder, filename)
+    level = image_cropper.pyramid_level(request.args.get('size'))
+    # Only signed lazy crop paths parse, so a forged box falls through to a 404 below
+    spec = image_cropper.parse_lazy_crop(filename)
+    if spec:
+        find_rendered = partial(image_cropper.find_rendered_crop, level=level)
+        render = partial(image_cropper.render_lazy_crop, level=level)
+    else:
+        # The upload's preview sprite atlas renders the same way, from its saved (or rebuilt) layout
+        spec = image_cropper.parse_sprite_atlas(filename)
+        find_rendered, render = image_cropper.find_rendered_sprite_atlas, render_sprite_atlas
+    if spec:
+        crop_path = find_rendered(spec)
+        if crop_path is None:
+            source_path = os.path.join(app.config['UPLOAD_FOLDER'], spec['upload'])
+            # The token pins the crop to the upload's content; a replaced upload 404s
+            if not os.path.isfile(source_path) or file_content_hash(source_path)[:16] != spec['token']:
+                return jsonify({'error': 'Crop source not found'}), 404
+            try:
+                crop_path = render(load_decoded_upload(source_path), spec)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 404
+        filename = os.path.relpath(crop_path, crop_folder)
+    else:
+        # Eager crops have their levels written next to them
+        filename = os.path.relpath(image_cropper.find_crop_level(os.path.join(crop_folder, filename), level), crop_folder)
+    # Keep the upload's crop directory fresh for the collector's LRU order
+    image_cropper.mark_used(filename.split('/', 1)[0])
+    # Lazy crop and atlas URLs name the upload's content and the box, so they never
+    # change; eager crops are rewritten in place by recrops and must revalidate
+    return send_cacheable(crop_folder, filename, immutable=spec is not None)
 
 @app.route('/api/recrop-section', methods=['POST'])
 def recrop_section():
@@ -212,16 +464,42 @@ def recrop_section():
             return jsonify({'error': 'Original image not found'}), 404
         
         # Re-crop the section with new coordinates
-        crop_path = image_cropper.crop_section(full_image_path, section_id, bounding_box)
+        image = load_decoded_upload(full_image_path)
+        crop_path = image_cropper.crop_section(image, section_id, bounding_box)
         
         if crop_path:
+            # Check the new box against an ink index of the page around it (not the whole page)
+            segmenter = image_analyzer.layout_segmenter
+            coords = image_cropper.validate_and_adjust_coordinates(bounding_box, image.width, image.height)
+            box = {'x': coords['x_px'], 'y': coords['y_px'], 'width': coords['width_px'], 'height': coords['height_px']}
+            snapped = segmenter.grow_block(image, box)
+            suggested_box = None
+            if snapped:
+                suggested_box = {
+                    'x': snapped['x'] / image.width * 100,
+                    'y': snapped['y'] / image.height * 100,
+                    'width': snapped['width'] / image.width * 100,
+                    'height': snapped['height'] / image.height * 100
+                }
+
             # Convert to relative path for serving
             relative_crop_path = os.path.relpath(crop_path, app.config['UPLOAD_FOLDER'])
-            return jsonify({
+            response = {
                 'success': True,
                 'crop_image': relative_crop_path,
+                'empty_region': segmenter.is_empty(image, box),
+                'suggested_bounding_box': suggested_box,
                 'message': f'Section {section_id} re-cropped successfully'
-            })
+            }
+
+            # Re-map the section's text from the stored OCR words (no Tesseract call)
+            word_index = word_store.get_index(full_image_path)
+            if word_index is not None:
+                current_text = ' '.join(w['text'] for w in word_index.words_in(
+                    box['x'], box['y'], box['width'], box['height']))
+                response['current_text'] = current_text
+                response['word_count'] = len(current_text.split())
+            return jsonify(response)
         else:
             return jsonify({'error': 'Failed to crop section'}), 500
             
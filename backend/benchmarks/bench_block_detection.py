@@ -0,0 +1,102 @@
+"""
+Timing and accuracy of multi-scale block detection.
+
+Runs LayoutSegmenter.detect_visual_blocks at full resolution and on
+downscaled copies (with and without full-resolution edge refinement) on
+synthetic pages, and reports the time per page plus the IoU agreement of
+each variant with the full-resolution boxes and with the ground-truth blocks.
+
+Usage (from backend/):
+    python benchmarks/bench_block_detection.py
+    python benchmarks/bench_block_detection.py --pages 5 --scales 0.5 0.33 --upscale 2 --output blocks.json
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+
+from benchmarks.synthetic_pages import render_page, match_boxes
+from services.decoded_image import DecodedImage
+from services.layout_segmenter import LayoutSegmenter
+
+
+def detect(segmenter, image, scale, refine):
+    # detect_visual_blocks prints a summary line per call; keep the table readable
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        blocks = segmenter.detect_visual_blocks(image, scale=scale, refine=refine)
+        elapsed = time.perf_counter() - start
+    return blocks, elapsed
+
+
+def scale_boxes(boxes, factor):
+    return [{k: int(b[k] * factor) for k in ('x', 'y', 'width', 'height')} for b in boxes]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--sections', type=int, default=10)
+    parser.add_argument('--upscale', type=float, default=2.0,
+                        help='Resize rendered pages by this factor to mimic retina screenshots')
+    parser.add_argument('--scales', type=float, nargs='+', default=[0.5, 0.33, 0.25])
+    parser.add_argument('--iou', type=float, default=0.5, help='IoU threshold for a box match')
+    parser.add_argument('--output', default='bench_block_detection.json')
+    args = parser.parse_args()
+
+    segmenter = LayoutSegmenter()
+    pages = []
+    for seed in range(args.pages):
+        page = render_page(seed=seed, section_count=args.sections)
+        pixels = cv2.resize(page['image'], None, fx=args.upscale, fy=args.upscale, interpolation=cv2.INTER_CUBIC)
+        image = DecodedImage(pixels)
+        image.gray  # Decode cost is shared by every variant, keep it out of the timings
+        pages.append((image, scale_boxes(page['blocks'], args.upscale)))
+
+    variants = [(1.0, False)] + [(s, r) for s in args.scales for r in (False, True)]
+    results = []
+    print(f"{'scale':>6} {'refine':>7} {'ms/page':>9} {'speedup':>8} {'IoU vs full':>12} {'recall vs full':>15} {'truth recall':>13}")
+    baseline_ms = None
+    full_res = []
+    for scale, refine in variants:
+        total = 0.0
+        vs_full, vs_truth = [], []
+        for index, (image, truth) in enumerate(pages):
+            blocks, elapsed = detect(segmenter, image, scale, refine)
+            total += elapsed
+            if scale == 1.0:
+                full_res.append(blocks)
+            vs_full.append(match_boxes(blocks, full_res[index], args.iou))
+            vs_truth.append(match_boxes(blocks, truth, args.iou))
+
+        ms = total * 1000 / len(pages)
+        baseline_ms = baseline_ms or ms
+        result = {
+            'scale': scale,
+            'refine': refine,
+            'ms_per_page': ms,
+            'megapixels': pages[0][0].width * pages[0][0].height / 1e6,
+            'speedup': baseline_ms / ms,
+            'mean_iou_vs_full': sum(m['mean_iou'] for m in vs_full) / len(vs_full),
+            'recall_vs_full': sum(m['recall'] for m in vs_full) / len(vs_full),
+            'recall_vs_truth': sum(m['recall'] for m in vs_truth) / len(vs_truth),
+            'precision_vs_truth': sum(m['precision'] for m in vs_truth) / len(vs_truth),
+        }
+        results.append(result)
+        print(f"{scale:>6.2f} {str(refine):>7} {ms:>9.1f} {result['speedup']:>7.1f}x "
+              f"{result['mean_iou_vs_full']:>12.3f} {result['recall_vs_full']:>15.3f} {result['recall_vs_truth']:>13.3f}")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""
+Crop encoding benchmark: encode time and file size per output format.
+
+Crops every ground-truth section of synthetic landing pages (with
+photographic hero backgrounds) and encodes them with each CropEncodingPolicy
+variant: the previous PIL PNG optimize=True, fast PNG levels, JPEG and WebP
+qualities, and auto (PNG for graphics, lossy for photos). Reports milliseconds
+per megapixel, total bytes, the share of crops auto treats as photographic and
+the PSNR of lossy output. Results are written as JSON.
+
+Usage (from backend/):
+    python benchmarks/bench_crop_encoding.py
+    python benchmarks/bench_crop_encoding.py --pages 5 --qualities 75 90 --output crops.json
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import numpy as np
+
+from benchmarks.synthetic_pages import render_page
+from services.crop_encoding import CropEncodingPolicy
+
+
+def run_variant(crops, policy, crop_format):
+    seconds = 0.0
+    total_bytes = 0
+    psnr = []
+    formats = []
+    for crop in crops:
+        start = time.perf_counter()
+        chosen = policy.choose_format(crop) if crop_format == 'auto' else crop_format
+        _, data = policy.encode(crop, chosen)
+        seconds += time.perf_counter() - start
+        total_bytes += len(data)
+        formats.append(chosen)
+        if chosen in ('jpeg', 'webp'):
+            decoded = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            psnr.append(cv2.PSNR(crop, decoded))
+
+    megapixels = sum(c.shape[0] * c.shape[1] for c in crops) / 1e6
+    return {
+        'seconds': seconds,
+        'ms_per_megapixel': seconds * 1000 / megapixels,
+        'bytes': total_bytes,
+        'lossy_share': sum(f in ('jpeg', 'webp') for f in formats) / len(formats),
+        'mean_psnr': sum(psnr) / len(psnr) if psnr else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=3)
+    parser.add_argument('--sections', type=int, default=8)
+    parser.add_argument('--png-levels', type=int, nargs='+', default=[1, 3, 6])
+    parser.add_argument('--qualities', type=int, nargs='+', default=[80, 90])
+    parser.add_argument('--output', default='bench_crop_encoding.json')
+    args = parser.parse_args()
+
+    crops = []
+    for seed in range(args.pages):
+        page = render_page(seed=seed, section_count=args.sections, photos=True)
+        for section in page['sections']:
+            crops.append(page['image'][section['y']:section['y'] + section['height']])
+    megapixels = sum(c.shape[0] * c.shape[1] for c in crops) / 1e6
+    print(f"{len(crops)} section crops from {args.pages} pages, {megapixels:.1f} MP")
+
+    variants = [('png-optimize', {})]
+    variants += [('png', {'png_compression': level}) for level in args.png_levels]
+    variants += [(fmt, {'quality': q}) for fmt in ('jpeg', 'webp') for q in args.qualities]
+    variants += [('auto', {'photo_format': fmt, 'quality': args.qualities[0]}) for fmt in ('jpeg', 'webp')]
+
+    results = []
+    baseline = None
+    print(f"{'variant':<28} {'ms/MP':>8} {'KB':>8} {'size':>6} {'lossy':>6} {'PSNR':>6}")
+    for crop_format, options in variants:
+        policy = CropEncodingPolicy(crop_format=crop_format, **options)
+        result = dict(format=crop_format, **options, **run_variant(crops, policy, crop_format))
+        baseline = baseline or result
+        results.append(result)
+        label = crop_format + ''.join(f" {k}={v}" for k, v in options.items())
+        psnr = f"{result['mean_psnr']:.1f}" if result['mean_psnr'] else '-'
+        print(f"{label:<28} {result['ms_per_megapixel']:>8.1f} {result['bytes'] / 1024:>8.0f} "
+              f"{result['bytes'] / baseline['bytes']:>5.0%} {result['lossy_share']:>6.0%} {psnr:>6}")
+
+    with open(args.output, 'w') as f:
+        json.dump({'pages': args.pages, 'crops': len(crops), 'megapixels': megapixels, 'results': results}, f, indent=2)
+    print(f"Saved results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
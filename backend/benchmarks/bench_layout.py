@@ -0,0 +1,177 @@
+"""
+Layout segmentation benchmark and accuracy harness.
+
+Renders synthetic landing pages (nav, hero, columns, cards, text sections and
+a footer, at several noise levels) with known section bands and content
+blocks, then runs LayoutSegmenter over parameter grids:
+
+  sections: find_horizontal_sections over min_gap_height x peak_ratio,
+            scored against the ground-truth section bands
+  blocks:   detect_visual_blocks over min_contour_area x max_contour_area x scale,
+            scored against the ground-truth content blocks
+  xy-cut:   xy_cut over min_row_gap x min_col_gap, scored against the same
+            blocks, so both LAYOUT_MODE choices can be compared directly
+  merge:    merge_overlapping_blocks on n stacked full-width blocks (touching,
+            plus a half-overlapping copy of each), to check it scales linearly
+
+Every variant reports ms per megapixel, precision, recall and mean IoU of the
+greedy one-to-one box matching. Results are written as JSON.
+
+Usage (from backend/):
+    python benchmarks/bench_layout.py
+    python benchmarks/bench_layout.py --pages 4 --noise 0 0.05 --gaps 30 40 60 \\
+        --min-areas 0.001 0.002 --output layout_bench.json
+"""
+import argparse
+import contextlib
+import io
+import itertools
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.synthetic_pages import render_page, match_boxes
+from services.decoded_image import DecodedImage
+from services.layout_segmenter import LayoutSegmenter
+
+
+def section_boxes(ranges, width):
+    return [{'x': 0, 'y': int(start), 'width': width, 'height': int(end - start)} for start, end in ranges]
+
+
+def score(pages, run, truth_key, iou_threshold):
+    """Run a segmentation callable on every page and average timing and match scores."""
+    seconds = 0.0
+    megapixels = 0.0
+    matches = []
+    for page in pages:
+        image = page['decoded']
+        # The segmenter prints a summary line per call; keep the table readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            predicted = run(image)
+            seconds += time.perf_counter() - start
+        megapixels += image.width * image.height / 1e6
+        matches.append(match_boxes(predicted, page[truth_key], iou_threshold))
+
+    count = len(matches)
+    return {
+        'ms_per_megapixel': seconds * 1000 / megapixels,
+        'precision': sum(m['precision'] for m in matches) / count,
+        'recall': sum(m['recall'] for m in matches) / count,
+        'mean_iou': sum(m['mean_iou'] for m in matches) / count,
+    }
+
+
+def fresh(image):
+    # A new DecodedImage over the same pixels, so memoized masks and indexes
+    # from an earlier variant do not leak into this variant's timing
+    copy = DecodedImage(image.pixels, image.path)
+    copy.gray
+    return copy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=3, help='Pages per noise level')
+    parser.add_argument('--sections', type=int, default=8, help='Sections per page')
+    parser.add_argument('--noise', type=float, nargs='+', default=[0.0, 0.03],
+                        help='Gaussian noise levels as a fraction of 255')
+    parser.add_argument('--gaps', type=int, nargs='+', default=[20, 40, 60, 80],
+                        help='min_gap_height values for find_horizontal_sections')
+    parser.add_argument('--peak-ratios', type=float, nargs='+', default=[0.05, 0.15, 0.3],
+                        help='peak_ratio values for find_horizontal_sections')
+    parser.add_argument('--min-areas', type=float, nargs='+', default=[0.0005, 0.001, 0.005],
+                        help='min_contour_area values for detect_visual_blocks')
+    parser.add_argument('--max-areas', type=float, nargs='+', default=[0.5, 0.95],
+                        help='max_contour_area values for detect_visual_blocks')
+    parser.add_argument('--scales', type=float, nargs='+', default=[1.0, 0.5],
+                        help='Detection scales for detect_visual_blocks')
+    parser.add_argument('--row-gaps', type=int, nargs='+', default=[20, 30, 50],
+                        help='min_row_gap values for xy_cut')
+    parser.add_argument('--col-gaps', type=int, nargs='+', default=[40, 60],
+                        help='min_col_gap values for xy_cut')
+    parser.add_argument('--merge-counts', type=int, nargs='+', default=[500, 1000, 2000, 4000],
+                        help='Stacked block counts for merge_overlapping_blocks')
+    parser.add_argument('--iou', type=float, default=0.5, help='IoU threshold for a box match')
+    parser.add_argument('--output', default='bench_layout.json')
+    args = parser.parse_args()
+
+    pages = []
+    for noise in args.noise:
+        for seed in range(args.pages):
+            page = render_page(seed=seed, section_count=args.sections, noise=noise)
+            page['decoded'] = DecodedImage(page['image'])
+            pages.append(page)
+    print(f"Rendered {len(pages)} pages ({args.pages} per noise level {args.noise}), "
+          f"{sum(len(p['sections']) for p in pages)} sections, {sum(len(p['blocks']) for p in pages)} blocks")
+
+    segmenter = LayoutSegmenter()
+    header = f"{'ms/MP':>8} {'precision':>10} {'recall':>7} {'IoU':>6}"
+
+    section_results = []
+    print(f"\nfind_horizontal_sections\n{'gap':>5} {'peak':>5} {header}")
+    for gap, ratio in itertools.product(args.gaps, args.peak_ratios):
+        def run(image):
+            image = fresh(image)
+            ranges = segmenter.find_horizontal_sections(image, min_gap_height=gap, peak_ratio=ratio)
+            return section_boxes(ranges, image.width)
+        result = dict(min_gap_height=gap, peak_ratio=ratio, **score(pages, run, 'sections', args.iou))
+        section_results.append(result)
+        print(f"{gap:>5} {ratio:>5.2f} {result['ms_per_megapixel']:>8.1f} {result['precision']:>10.3f} "
+              f"{result['recall']:>7.3f} {result['mean_iou']:>6.3f}")
+
+    block_results = []
+    print(f"\ndetect_visual_blocks\n{'min area':>9} {'max area':>9} {'scale':>6} {header}")
+    for min_area, max_area, scale in itertools.product(args.min_areas, args.max_areas, args.scales):
+        def run(image):
+            return segmenter.detect_visual_blocks(fresh(image), min_contour_area=min_area,
+                                                  max_contour_area=max_area, scale=scale)
+        result = dict(min_contour_area=min_area, max_contour_area=max_area, scale=scale,
+                      refine=segmenter.detect_refine, **score(pages, run, 'blocks', args.iou))
+        block_results.append(result)
+        print(f"{min_area:>9.4f} {max_area:>9.2f} {scale:>6.2f} {result['ms_per_megapixel']:>8.1f} "
+              f"{result['precision']:>10.3f} {result['recall']:>7.3f} {result['mean_iou']:>6.3f}")
+
+    xy_cut_results = []
+    print(f"\nxy_cut\n{'row gap':>8} {'col gap':>8} {header}")
+    for row_gap, col_gap in itertools.product(args.row_gaps, args.col_gaps):
+        def run(image):
+            return segmenter.xy_cut(fresh(image), min_row_gap=row_gap, min_col_gap=col_gap)['blocks']
+        result = dict(min_row_gap=row_gap, min_col_gap=col_gap, **score(pages, run, 'blocks', args.iou))
+        xy_cut_results.append(result)
+        print(f"{row_gap:>8} {col_gap:>8} {result['ms_per_megapixel']:>8.1f} {result['precision']:>10.3f} "
+              f"{result['recall']:>7.3f} {result['mean_iou']:>6.3f}")
+
+    merge_results = []
+    print(f"\nmerge_overlapping_blocks (stacked full-width)\n{'blocks':>7} {'ms':>8} {'us/block':>9} {'merged':>7}")
+    for count in args.merge_counts:
+        stacked = [{'x': 0, 'y': i * 40, 'width': 1400, 'height': 40} for i in range(count)]
+        stacked += [{'x': 0, 'y': i * 40 + 20, 'width': 1400, 'height': 40} for i in range(count)]
+        start = time.perf_counter()
+        merged = segmenter.merge_overlapping_blocks(stacked)
+        seconds = time.perf_counter() - start
+        result = {'blocks': len(stacked), 'ms': seconds * 1000,
+                  'us_per_block': seconds * 1e6 / len(stacked), 'merged': len(merged)}
+        merge_results.append(result)
+        print(f"{result['blocks']:>7} {result['ms']:>8.1f} {result['us_per_block']:>9.1f} {result['merged']:>7}")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'pages': args.pages,
+            'sections': args.sections,
+            'noise': args.noise,
+            'iou_threshold': args.iou,
+            'horizontal_sections': section_results,
+            'visual_blocks': block_results,
+            'xy_cut': xy_cut_results,
+            'merge_scaling': merge_results,
+        }, f, indent=2)
+    print(f"\nSaved results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
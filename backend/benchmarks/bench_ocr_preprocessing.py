@@ -0,0 +1,114 @@
+"""
+OCR preprocessing benchmark on synthetic landing pages with known text.
+
+Runs the OCR stage under preprocessing variants (Otsu / adaptive threshold /
+plain grayscale), downscale factors and Tesseract page segmentation modes,
+and reports words per second, ms per megapixel and word-level recall against
+the rendered ground truth. Results are written as JSON so regressions can be
+tracked between runs.
+
+Usage (from backend/, requires the tesseract binary):
+    python benchmarks/bench_ocr_preprocessing.py
+    python benchmarks/bench_ocr_preprocessing.py --pages 3 --methods otsu adaptive \\
+        --scales 1.0 0.75 --psms 3 6 --output ocr_bench.json
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+
+from benchmarks.synthetic_pages import render_page
+from services.image_analyzer import preprocess_for_ocr
+from services.ocr_backends import create_ocr_backend
+
+
+def normalize(word):
+    return re.sub(r'[^a-z0-9]', '', word.lower())
+
+
+def word_recall(recognized, truth):
+    """Fraction of ground-truth words (as a multiset) that were recognized."""
+    expected = Counter(normalize(w['text']) for w in truth)
+    found = Counter(normalize(t) for t in recognized)
+    hits = sum(min(count, found[word]) for word, count in expected.items())
+    return hits / max(1, sum(expected.values()))
+
+
+def run_variant(backend, pages, method, scale, psm):
+    total_seconds = 0.0
+    total_megapixels = 0.0
+    total_words = 0
+    recalls = []
+    for page in pages:
+        gray = cv2.cvtColor(page['image'], cv2.COLOR_BGR2GRAY)
+        start = time.perf_counter()
+        prepared = preprocess_for_ocr(gray, method, scale)
+        data = backend.image_to_data(prepared, psm=psm)
+        total_seconds += time.perf_counter() - start
+
+        recognized = [t for t, c in zip(data['text'], data['conf']) if float(c) > 30 and t.strip()]
+        total_words += len(recognized)
+        total_megapixels += gray.shape[0] * gray.shape[1] / 1e6
+        recalls.append(word_recall(recognized, page['words']))
+
+    return {
+        'method': method,
+        'scale': scale,
+        'psm': psm,
+        'seconds': total_seconds,
+        'words_per_second': total_words / total_seconds if total_seconds else 0.0,
+        'ms_per_megapixel': total_seconds * 1000 / total_megapixels,
+        'recall': sum(recalls) / len(recalls),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pages', type=int, default=3, help='Number of synthetic pages')
+    parser.add_argument('--sections', type=int, default=6, help='Sections per page')
+    parser.add_argument('--noise', type=float, default=0.02, help='Gaussian noise as a fraction of 255')
+    parser.add_argument('--methods', nargs='+', default=['otsu', 'adaptive', 'none'])
+    parser.add_argument('--scales', type=float, nargs='+', default=[1.0, 0.75, 0.5])
+    parser.add_argument('--psms', type=int, nargs='+', default=[3, 4, 6, 11])
+    parser.add_argument('--backend', default=None, help='OCR backend (default: OCR_BACKEND env / auto)')
+    parser.add_argument('--output', default='bench_ocr_preprocessing.json')
+    args = parser.parse_args()
+
+    backend = create_ocr_backend(args.backend)
+    if not backend.is_available():
+        raise SystemExit("Tesseract is required to run this benchmark")
+
+    pages = [render_page(seed=i, section_count=args.sections, noise=args.noise) for i in range(args.pages)]
+    print(f"Rendered {len(pages)} pages, {sum(len(p['words']) for p in pages)} ground-truth words "
+          f"(backend: {backend.name})")
+
+    results = []
+    print(f"{'method':>9} {'scale':>6} {'psm':>4} {'words/s':>9} {'ms/MP':>9} {'recall':>7}")
+    for method in args.methods:
+        for scale in args.scales:
+            for psm in args.psms:
+                result = run_variant(backend, pages, method, scale, psm)
+                results.append(result)
+                print(f"{method:>9} {scale:>6.2f} {psm:>4} {result['words_per_second']:>9.0f} "
+                      f"{result['ms_per_megapixel']:>9.1f} {result['recall']:>7.3f}")
+
+    with open(args.output, 'w') as f:
+        json.dump({
+            'backend': backend.name,
+            'pages': args.pages,
+            'sections': args.sections,
+            'noise': args.noise,
+            'results': results,
+        }, f, indent=2)
+    print(f"Saved results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""
+Micro-benchmark for mapping OCR words to layout blocks.
+
+Compares the original nested-loop assignment with the WordIndex-based one
+across word and block counts, and checks both produce the same sections.
+
+Usage (from backend/):
+    python benchmarks/bench_text_mapping.py
+    python benchmarks/bench_text_mapping.py --words 1000 4000 16000 --blocks 50 200 800
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.word_index import WordIndex
+
+PAGE_WIDTH = 1440
+PAGE_HEIGHT = 15000
+
+
+def naive_assign(blocks, text_elements):
+    """Reference implementation: the original block x word loop."""
+    result = []
+    for block in blocks:
+        contained = []
+        for text in text_elements:
+            cx = text['x'] + text['width'] / 2
+            cy = text['y'] + text['height'] / 2
+            if (block['x'] < cx < block['x'] + block['width']) and \
+               (block['y'] < cy < block['y'] + block['height']):
+                contained.append(text)
+        contained.sort(key=lambda t: (t['y'], t['x']))
+        result.append(contained)
+    return result
+
+
+def make_words(count, rng):
+    words = []
+    for i in range(count):
+        w = rng.randint(20, 120)
+        h = rng.randint(12, 40)
+        words.append({
+            'text': f'w{i}',
+            'x': rng.randint(0, PAGE_WIDTH - w),
+            'y': rng.randint(0, PAGE_HEIGHT - h),
+            'width': w,
+            'height': h
+        })
+    return words
+
+
+def make_blocks(count, rng):
+    blocks = []
+    for _ in range(count):
+        w = rng.randint(80, PAGE_WIDTH)
+        h = rng.randint(40, 900)
+        blocks.append({
+            'x': rng.randint(0, PAGE_WIDTH - w),
+            'y': rng.randint(0, PAGE_HEIGHT - h),
+            'width': w,
+            'height': h
+        })
+    blocks.sort(key=lambda b: b['y'])
+    return blocks
+
+
+def best_of(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--words', type=int, nargs='+', default=[500, 2000, 4000, 8000])
+    parser.add_argument('--blocks', type=int, nargs='+', default=[25, 100, 250])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', default='bench_text_mapping.json')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    results = []
+    print(f"{'words':>7} {'blocks':>7} {'naive ms':>10} {'index ms':>10} {'speedup':>8}")
+    for word_count in args.words:
+        words = make_words(word_count, rng)
+        for block_count in args.blocks:
+            blocks = make_blocks(block_count, rng)
+            naive_s, expected = best_of(lambda: naive_assign(blocks, words), args.repeat)
+            index_s, actual = best_of(lambda: WordIndex(words).assign(blocks), args.repeat)
+            if actual != expected:
+                raise SystemExit(f"Mismatch for {word_count} words x {block_count} blocks")
+
+            results.append({
+                'words': word_count,
+                'blocks': block_count,
+                'naive_ms': naive_s * 1000,
+                'index_ms': index_s * 1000,
+                'speedup': naive_s / index_s if index_s else None
+            })
+            print(f"{word_count:>7} {block_count:>7} {naive_s * 1000:>10.2f} {index_s * 1000:>10.2f} "
+                  f"{naive_s / index_s:>7.1f}x")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Saved results to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
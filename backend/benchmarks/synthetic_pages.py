@@ -0,0 +1,291 @@
+"""
+Synthetic landing-page renderer with ground truth for the benchmarks.
+
+Pages are drawn with PIL from a seeded random layout: navigation bar, hero,
+multi-column features, card grids, text sections and a footer, on varying
+background colors and font sizes. Every rendered word, content block and
+full-width section band is recorded, so OCR recall and segmentation
+precision/recall can be measured without hand labelling.
+"""
+import random
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+VOCABULARY = (
+    "discover better sleep tonight premium organic cotton sheets free shipping "
+    "returns guaranteed customers love our bestselling collection shop now learn "
+    "more save today limited offer crafted with care designed for comfort trusted "
+    "by thousands real results simple pricing start your trial join newsletter "
+    "fast delivery secure checkout support contact about careers privacy terms"
+).split()
+
+LIGHT_BACKGROUNDS = [(255, 255, 255), (247, 244, 238), (236, 242, 250), (244, 247, 242)]
+DARK_BACKGROUNDS = [(24, 32, 48), (52, 28, 72), (18, 64, 60)]
+SECTION_KINDS = ['hero', 'columns', 'cards', 'text', 'columns', 'cards', 'text']
+
+_font_cache = {}
+
+
+def load_font(size):
+    """TrueType font when one is installed, otherwise PIL's built-in font."""
+    if size not in _font_cache:
+        font = None
+        for name in ('DejaVuSans.ttf', 'Arial.ttf', 'LiberationSans-Regular.ttf'):
+            try:
+                font = ImageFont.truetype(name, size)
+                break
+            except OSError:
+                continue
+        if font is None:
+            try:
+                font = ImageFont.load_default(size=size)
+            except TypeError:
+                font = ImageFont.load_default()
+        _font_cache[size] = font
+    return _font_cache[size]
+
+
+class PageBuilder:
+    def __init__(self, width, rng, photos=False):
+        self.width = width
+        self.rng = rng
+        self.photos = photos
+        self.ops = []       # Deferred drawing ops, replayed once the height is known
+        self.words = []
+        self.blocks = []
+        self.sections = []
+        self.y = 0
+
+    def words_line(self, count):
+        return [self.rng.choice(VOCABULARY) for _ in range(count)]
+
+    def text_block(self, x, y, max_width, lines, size, color):
+        """Lay out word-wrapped text and record each word box. Returns the block box."""
+        font = load_font(size)
+        line_height = int(size * 1.5)
+        space = font.getlength(' ')
+        cursor_y = y
+        right = x
+        for line in lines:
+            cursor_x = x
+            for word in line:
+                word_width = font.getlength(word)
+                if cursor_x + word_width > x + max_width and cursor_x > x:
+                    cursor_x = x
+                    cursor_y += line_height
+                self.ops.append(('text', (cursor_x, cursor_y), word, font, color))
+                left, top, r, bottom = font.getbbox(word)
+                self.words.append({
+                    'text': word,
+                    'x': int(cursor_x + left),
+                    'y': int(cursor_y + top),
+                    'width': int(r - left),
+                    'height': int(bottom - top)
+                })
+                cursor_x += word_width + space
+                right = max(right, cursor_x - space)
+            cursor_y += line_height
+        return {'x': int(x), 'y': int(y), 'width': int(right - x), 'height': int(cursor_y - y)}
+
+    def add_block(self, box, kind):
+        self.blocks.append(dict(box, kind=kind))
+
+    def section(self, kind):
+        rng = self.rng
+        dark = kind in ('hero', 'footer') and rng.random() < 0.7
+        background = rng.choice(DARK_BACKGROUNDS if dark else LIGHT_BACKGROUNDS)
+        color = (245, 245, 245) if dark else (30, 30, 30)
+        top = self.y
+        pad = rng.randint(60, 120)
+        margin = int(self.width * 0.08)
+        inner = self.width - 2 * margin
+        y = top + pad
+
+        if kind == 'nav':
+            pad = 24
+            y = top + pad
+            box = self.text_block(margin, y, inner, [self.words_line(6)], 18, color)
+            self.add_block(box, kind)
+            y += box['height']
+        elif kind == 'hero':
+            if self.photos:
+                # Photographic hero background, drawn before the hero's text
+                self.ops.append(('photo', (0, top), photo_texture(self.width, rng.randint(600, 900), rng)))
+            head = self.text_block(margin, y, inner * 0.7, [self.words_line(6)], rng.choice([48, 56, 64]), color)
+            sub = self.text_block(margin, y + head['height'] + 20, inner * 0.6,
+                                  [self.words_line(14)], 22, color)
+            button_y = sub['y'] + sub['height'] + 30
+            self.ops.append(('rect', (margin, button_y, margin + 220, button_y + 56), (220, 90, 40)))
+            # Button label; drawn inside the button, so it adds no block of its own
+            self.text_block(margin + 30, button_y + 14, 180, [self.words_line(2)], 20, (255, 255, 255))
+            union = _union([head, sub, {'x': margin, 'y': button_y, 'width': 220, 'height': 56}])
+            self.add_block(union, kind)
+            y = union['y'] + union['height']
+        elif kind == 'columns':
+            count = rng.choice([2, 3, 4])
+            gap = 80
+            col_width = (inner - gap * (count - 1)) / count
+            bottom = y
+            for i in range(count):
+                x = margin + i * (col_width + gap)
+                title = self.text_block(x, y, col_width, [self.words_line(3)], 26, color)
+                body = self.text_block(x, y + title['height'] + 12, col_width,
+                                       [self.words_line(rng.randint(12, 30))], 17, color)
+                box = _union([title, body])
+                self.add_block(box, kind)
+                bottom = max(bottom, box['y'] + box['height'])
+            y = bottom
+        elif kind == 'cards':
+            count = rng.choice([3, 4])
+            gap = 40
+            card_width = (inner - gap * (count - 1)) / count
+            card_height = rng.randint(260, 360)
+            for i in range(count):
+                x = margin + i * (card_width + gap)
+                self.ops.append(('outline', (x, y, x + card_width, y + card_height), (190, 190, 190)))
+                self.text_block(x + 24, y + 24, card_width - 48, [self.words_line(3)], 22, color)
+                self.text_block(x + 24, y + 80, card_width - 48, [self.words_line(rng.randint(8, 18))], 16, color)
+                self.add_block({'x': int(x), 'y': int(y), 'width': int(card_width), 'height': card_height}, kind)
+            y += card_height
+        elif kind == 'text':
+            box = self.text_block(margin, y, inner * 0.8,
+                                  [self.words_line(rng.randint(25, 60)) for _ in range(rng.randint(1, 3))],
+                                  18, color)
+            self.add_block(box, kind)
+            y = box['y'] + box['height']
+        elif kind == 'footer':
+            count = 4
+            col_width = inner / count
+            bottom = y
+            for i in range(count):
+                box = self.text_block(margin + i * col_width, y, col_width - 40,
+                                      [self.words_line(1) for _ in range(4)], 15, color)
+                bottom = max(bottom, box['y'] + box['height'])
+            self.add_block({'x': margin, 'y': y, 'width': int(inner), 'height': int(bottom - y)}, kind)
+            y = bottom
+
+        bottom = int(y + pad)
+        for i, op in enumerate(self.ops):
+            if op[0] == 'photo' and op[1][1] == top and op[2].shape[0] != bottom - top:
+                # Fit the photo to the final section height
+                self.ops[i] = ('photo', op[1], cv2.resize(op[2], (self.width, bottom - top)))
+        self.ops.insert(0, ('rect', (0, top, self.width, bottom), background))
+        self.sections.append({'kind': kind, 'x': 0, 'y': top, 'width': self.width, 'height': bottom - top})
+        self.y = bottom
+
+    def render(self, noise=0.0):
+        image = Image.new('RGB', (self.width, self.y), (255, 255, 255))
+        draw = ImageDraw.Draw(image)
+        # Backgrounds first so they never cover text from an earlier section
+        for op in sorted(self.ops, key=lambda op: op[0] != 'rect' or op[1][0] != 0 or op[1][2] != self.width):
+            if op[0] == 'rect':
+                draw.rectangle(op[1], fill=op[2])
+            elif op[0] == 'photo':
+                image.paste(Image.fromarray(op[2]), op[1])
+            elif op[0] == 'outline':
+                draw.rectangle(op[1], outline=op[2], width=2)
+            else:
+                _, position, word, font, color = op
+                draw.text(position, word, font=font, fill=color)
+        pixels = cv2.cvtColor(np.asarray(image), cv2.COLOR_RGB2BGR)
+        if noise > 0:
+            jitter = np.random.default_rng(self.rng.randint(0, 2 ** 31)).normal(0, noise * 255, pixels.shape)
+            pixels = np.clip(pixels + jitter, 0, 255).astype(np.uint8)
+        return pixels
+
+
+def _union(boxes):
+    x0 = min(b['x'] for b in boxes)
+    y0 = min(b['y'] for b in boxes)
+    x1 = max(b['x'] + b['width'] for b in boxes)
+    y1 = max(b['y'] + b['height'] for b in boxes)
+    return {'x': int(x0), 'y': int(y0), 'width': int(x1 - x0), 'height': int(y1 - y0)}
+
+
+def photo_texture(width, height, rng):
+    """
+    Photo-like RGB texture: multi-octave value noise with a color cast and
+    sensor grain, so it has the continuous tones of a photograph.
+    """
+    noise_rng = np.random.default_rng(rng.randint(0, 2 ** 31))
+    aspect = max(1, round(width / height))
+    texture = np.zeros((height, width, 3), dtype=np.float32)
+    for octave in range(1, 8):
+        cells = 2 ** octave
+        small = noise_rng.random((cells, cells * aspect, 3), dtype=np.float32)
+        texture += cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC) / (1.7 ** octave)
+    texture -= texture.min()
+    texture *= noise_rng.uniform(150, 230) / max(float(texture.max()), 1e-6)
+    texture += noise_rng.uniform(0, 40, size=3).astype(np.float32)
+    texture += noise_rng.normal(0, 3, texture.shape).astype(np.float32)
+    return np.clip(texture, 0, 255).astype(np.uint8)
+
+
+def render_page(seed=0, width=1440, section_count=8, noise=0.0, photos=False):
+    """
+    Render a synthetic landing page.
+
+    Args:
+        seed: Random seed; the same seed always yields the same page
+        width: Page width in pixels
+        section_count: Number of sections between the nav bar and the footer
+        noise: Standard deviation of added Gaussian noise, as a fraction of 255
+        photos: Give hero sections a photographic background
+
+    Returns:
+        Dict with image (BGR NumPy array), words, blocks and sections; boxes are
+        dicts with x, y, width, height in pixels
+    """
+    rng = random.Random(seed)
+    builder = PageBuilder(width, rng, photos)
+    builder.section('nav')
+    builder.section('hero')
+    for _ in range(section_count):
+        builder.section(rng.choice(SECTION_KINDS[1:]))
+    builder.section('footer')
+    return {
+        'image': builder.render(noise),
+        'words': builder.words,
+        'blocks': builder.blocks,
+        'sections': builder.sections,
+    }
+
+
+def iou(a, b):
+    """Intersection over union of two x/y/width/height boxes."""
+    ix = min(a['x'] + a['width'], b['x'] + b['width']) - max(a['x'], b['x'])
+    iy = min(a['y'] + a['height'], b['y'] + b['height']) - max(a['y'], b['y'])
+    if ix <= 0 or iy <= 0:
+        return 0.0
+    inter = ix * iy
+    return inter / float(a['width'] * a['height'] + b['width'] * b['height'] - inter)
+
+
+def match_boxes(predicted, truth, threshold=0.5):
+    """
+    Greedy one-to-one matching of predicted boxes to ground-truth boxes by IoU.
+
+    Returns:
+        Dict with precision, recall, mean_iou (over matches) and matches
+    """
+    pairs = sorted(
+        ((iou(p, t), i, j) for i, p in enumerate(predicted) for j, t in enumerate(truth)),
+        reverse=True
+    )
+    used_p, used_t, matched = set(), set(), []
+    for score, i, j in pairs:
+        if score < threshold:
+            break
+        if i in used_p or j in used_t:
+            continue
+        used_p.add(i)
+        used_t.add(j)
+        matched.append(score)
+    return {
+        'precision': len(matched) / len(predicted) if predicted else 0.0,
+        'recall': len(matched) / len(truth) if truth else 0.0,
+        'mean_iou': sum(matched) / len(matched) if matched else 0.0,
+        'matches': len(matched),
+    }
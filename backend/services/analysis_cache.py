@@ -0,0 +1,130 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+
+# Bump whenever a pipeline change alters analysis output for the same image
+PIPELINE_VERSION = '1'
+
+
+class AnalysisCache:
+    """
+    Persistent, content-addressed cache of full image analysis results.
+
+    Entries are JSON files keyed by a hash of the image bytes, the pipeline
+    version and the analysis parameters. Each entry holds the analyzed
+    sections, the OCR word boxes and the crop metadata, so a repeat upload of
+    the same screenshot skips segmentation, OCR and every model call. The
+    directory is kept under a size budget with least-recently-used eviction
+    (entry mtime is refreshed on every hit).
+    """
+
+    def __init__(self, cache_dir=None, max_bytes=None):
+        self.cache_dir = cache_dir or os.getenv('ANALYSIS_CACHE_DIR', os.path.join('data', 'cache'))
+        if max_bytes is None:
+            max_bytes = int(os.getenv('ANALYSIS_CACHE_MAX_MB', 256)) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.enabled = os.getenv('ANALYSIS_CACHE', '1') != '0'
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    @staticmethod
+    def hash_file(path, chunk_size=1024 * 1024):
+        """Return the SHA-256 hex digest of a file, read in chunks."""
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(chunk_size), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def make_key(self, image_path, params, file_hash=None):
+        """
+        Build the cache key for an image and a set of pipeline parameters.
+
+        Args:
+            image_path: Path to the uploaded image
+            params: JSON-serializable dict of parameters that affect the result
+            file_hash: The image's hash_file digest, if the caller already has it
+
+        Returns:
+            Hex digest identifying the analysis result
+        """
+        key = hashlib.sha256()
+        key.update((file_hash or self.hash_file(image_path)).encode())
+        key.update(PIPELINE_VERSION.encode())
+        key.update(json.dumps(params, sort_keys=True).encode())
+        return key.hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key):
+        """
+        Look up a cached analysis.
+
+        Returns:
+            The stored entry dict, or None on a miss
+        """
+        if not self.enabled:
+            return None
+        path = self._entry_path(key)
+        try:
+            with open(path, 'r') as f:
+                entry = json.load(f)
+            os.utime(path, None)  # Mark as recently used
+            return entry
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Discarding unreadable analysis cache entry {key}: {e}")
+            self._remove(path)
+            return None
+
+    def put(self, key, entry):
+        """
+        Store an analysis result and evict old entries if over budget.
+
+        Args:
+            key: Key from make_key
+            entry: JSON-serializable dict (sections, text_elements, crops, ...)
+        """
+        if not self.enabled:
+            return
+        try:
+            entry = dict(entry, cached_at=time.time())
+            # Write to a temp file first so concurrent workers never read a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._entry_path(key))
+            self._evict()
+        except Exception as e:
+            print(f"⚠️  Could not write analysis cache entry: {e}")
+
+    def _evict(self):
+        """Delete least-recently-used entries until the cache fits its size budget."""
+        entries = []
+        total = 0
+        with os.scandir(self.cache_dir) as it:
+            for item in it:
+                if not item.name.endswith('.json'):
+                    continue
+                stat = item.stat()
+                entries.append((stat.st_mtime, stat.st_size, item.path))
+                total += stat.st_size
+
+        if total <= self.max_bytes:
+            return
+
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
@@ -0,0 +1,98 @@
+import os
+import io
+import cv2
+import numpy as np
+from PIL import Image
+
+
+class CropEncodingPolicy:
+    """
+    Decides how section crops are encoded on disk.
+
+    PNG is written with a fast zlib level by default. 'auto' keeps PNG for
+    flat UI graphics and text, where it is lossless and small, and switches
+    to a lossy format for photographic crops (hero images, product shots),
+    where PNG files are several times larger. 'png-optimize' reproduces the
+    previous output (PIL PNG with optimize=True).
+
+    Configured via environment variables:
+        CROP_FORMAT             auto | png | png-optimize | webp | jpeg (default auto)
+        CROP_QUALITY            JPEG/WebP quality 1-100 (default 85)
+        CROP_PNG_COMPRESSION    zlib level 0-9 for PNG (default 3)
+        CROP_PHOTO_FORMAT       lossy format used by auto for photos: webp | jpeg (default jpeg)
+        CROP_PHOTO_THRESHOLD    fraction of visibly changing neighbour pixels above
+                                which a crop counts as photographic (default 0.4)
+    """
+
+    ENCODINGS = {
+        'png': ('.png', None),
+        'png-optimize': ('.png', None),
+        'jpeg': ('.jpg', cv2.IMWRITE_JPEG_QUALITY),
+        'webp': ('.webp', cv2.IMWRITE_WEBP_QUALITY),
+    }
+
+    def __init__(self, crop_format=None, quality=None, png_compression=None, photo_format=None,
+                 photo_threshold=None):
+        self.crop_format = (crop_format or os.getenv('CROP_FORMAT', 'auto')).lower()
+        self.quality = quality or int(os.getenv('CROP_QUALITY', 85))
+        self.png_compression = png_compression if png_compression is not None else int(os.getenv('CROP_PNG_COMPRESSION', 3))
+        self.photo_format = (photo_format or os.getenv('CROP_PHOTO_FORMAT', 'jpeg')).lower()
+        self.photo_threshold = photo_threshold if photo_threshold is not None else float(os.getenv('CROP_PHOTO_THRESHOLD', 0.4))
+
+        if self.crop_format != 'auto' and self.crop_format not in self.ENCODINGS:
+            print(f"⚠️  Unknown CROP_FORMAT '{self.crop_format}', using auto")
+            self.crop_format = 'auto'
+        if self.photo_format not in ('jpeg', 'webp'):
+            print(f"⚠️  Unknown CROP_PHOTO_FORMAT '{self.photo_format}', using jpeg")
+            self.photo_format = 'jpeg'
+
+    @property
+    def extensions(self):
+        """Every file extension this policy can produce."""
+        return sorted({extension for extension, _ in self.ENCODINGS.values()})
+
+    def photo_score(self, region, max_side=256):
+        """
+        Fraction of pixels that differ visibly from their right-hand neighbour.
+
+        Flat UI backgrounds and text score low (only glyph edges change);
+        photographs score high because their tones vary almost everywhere.
+        Measured on a strided sample of at most max_side pixels per side.
+        """
+        height, width = region.shape[:2]
+        if width < 2 or height < 1:
+            return 0.0
+        step = max(1, int(np.ceil(max(height, width) / float(max_side))))
+        sample = region[::step, ::step].astype(np.int16)
+        if sample.shape[1] < 2:
+            return 0.0
+        delta = np.abs(np.diff(sample, axis=1))
+        if delta.ndim == 3:
+            delta = delta.sum(axis=2)
+        return float((delta > 4).mean())
+
+    def choose_format(self, region):
+        """Encoding for a BGR region: the configured format, or png/photo format for auto."""
+        if self.crop_format != 'auto':
+            return self.crop_format
+        return self.photo_format if self.photo_score(region) > self.photo_threshold else 'png'
+
+    def encode(self, region, crop_format=None):
+        """
+        Encode a BGR region.
+
+        Returns:
+            (extension, bytes)
+        """
+        crop_format = crop_format or self.choose_format(region)
+        extension, quality_flag = self.ENCODINGS[crop_format]
+        if crop_format == 'png-optimize':
+            buffer = io.BytesIO()
+            Image.fromarray(cv2.cvtColor(region, cv2.COLOR_BGR2RGB)).save(buffer, 'PNG', optimize=True)
+            return extension, buffer.getvalue()
+
+        params = [quality_flag, self.quality] if quality_flag is not None else [cv2.IMWRITE_PNG_COMPRESSION, self.png_compression]
+        ok, buffer = cv2.imencode(extension, region, params)
+        if not ok:
+            raise ValueError(f"Could not encode crop as {crop_format}")
+        return extension, buffer.tobytes()
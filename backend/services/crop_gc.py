@@ -0,0 +1,165 @@
+import os
+import time
+import shutil
+import threading
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, assume a single process
+    fcntl = None
+
+
+class CropGarbageCollector:
+    """
+    Background collector for per-upload crop directories.
+
+    Every upload keeps its crops in its own directory under the crop folder.
+    The directory's mtime is the upload's last use (refreshed when crops are
+    written or served). A daemon thread periodically removes directories
+    unused for longer than the TTL, then evicts least-recently-used
+    directories until the crop folder fits its disk quota. Request handlers
+    never scan the crop folder, so upload latency stays flat however many
+    past uploads are on disk.
+
+    Every gunicorn worker (and the reloader's parent) imports the app, so only
+    the process holding an exclusive lock on LOCK_NAME in the crop folder
+    collects; the others retry the lock each interval and take over if the
+    leader exits. Directories used within the grace window are never removed,
+    so a crop being written is not deleted under its writer.
+
+    When given a word store, each pass also expires OCR word entries unused
+    for longer than the TTL.
+
+    Configured via environment variables:
+        CROP_TTL_HOURS          remove crops unused for this long (default 72)
+        CROP_MAX_MB             disk quota for all crops (default 1024)
+        CROP_GC_INTERVAL        seconds between collections (default 600)
+        CROP_GC_GRACE_SECONDS   never remove crops used this recently (default 300)
+    """
+
+    LOCK_NAME = '.crop-gc.lock'
+
+    def __init__(self, crop_folder, ttl_seconds=None, max_bytes=None, interval=None, grace_seconds=None,
+                 word_store=None):
+        self.crop_folder = crop_folder
+        self.word_store = word_store
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(os.getenv('CROP_TTL_HOURS', 72)) * 3600
+        if max_bytes is None:
+            max_bytes = int(os.getenv('CROP_MAX_MB', 1024)) * 1024 * 1024
+        self.max_bytes = max_bytes
+        self.interval = interval if interval is not None else float(os.getenv('CROP_GC_INTERVAL', 600))
+        if grace_seconds is None:
+            grace_seconds = float(os.getenv('CROP_GC_GRACE_SECONDS', 300))
+        self.grace_seconds = grace_seconds
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock_file = None
+
+    def start(self):
+        """Start the background collection thread (idempotent)."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='crop-gc', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._lock_file is not None:
+            self._lock_file.close()  # Releases the flock for another process
+            self._lock_file = None
+
+    def _acquire_leadership(self):
+        """
+        Try to become the one process that collects this crop folder.
+
+        Returns:
+            True if this process holds (or just took) the collector lock
+        """
+        if self._lock_file is not None:
+            return True
+        if fcntl is None:
+            return True
+        lock_file = open(os.path.join(self.crop_folder, self.LOCK_NAME), 'a')
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        # Held for the life of the process; the kernel drops it when we exit
+        self._lock_file = lock_file
+        print(f"🧹 Crop GC running in process {os.getpid()}")
+        return True
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                if self._acquire_leadership():
+                    self.collect()
+            except Exception as e:
+                print(f"⚠️  Crop garbage collection failed: {e}")
+
+    def _in_use(self, path, last_used, now):
+        """True if the directory was used within the grace window or since the scan."""
+        try:
+            mtime = os.stat(path).st_mtime
+        except OSError:
+            return True
+        return mtime != last_used or now - mtime < self.grace_seconds
+
+    def _directory_size(self, path):
+        total = 0
+        for root, _, files in os.walk(path):
+            for name in files:
+                try:
+                    total += os.stat(os.path.join(root, name)).st_size
+                except OSError:
+                    pass
+        return total
+
+    def collect(self, now=None):
+        """
+        Run one collection pass.
+
+        Returns:
+            Dict with removed (directory count), freed and remaining bytes, and
+            words (expired word store entries)
+        """
+        now = now or time.time()
+        uploads = []
+        with os.scandir(self.crop_folder) as it:
+            for entry in it:
+                if entry.name == self.LOCK_NAME:
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        uploads.append([entry.stat().st_mtime, self._directory_size(entry.path), entry.path])
+                    elif entry.is_file():
+                        # Crops from before per-upload directories; expire by TTL only
+                        stat = entry.stat()
+                        if now - stat.st_mtime > self.ttl_seconds:
+                            os.remove(entry.path)
+                except OSError:
+                    continue
+
+        removed, freed = 0, 0
+        total = sum(size for _, size, _ in uploads)
+        uploads.sort()  # Least recently used first
+        for last_used, size, path in uploads:
+            if now - last_used <= self.ttl_seconds and total <= self.max_bytes:
+                break
+            # A crop may still be being written; its bytes still count toward the quota
+            if self._in_use(path, last_used, now):
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+            removed += 1
+            freed += size
+            total -= size
+
+        words = self.word_store.collect(self.ttl_seconds, now) if self.word_store is not None else 0
+        if removed:
+            print(f"🧹 Crop GC removed {removed} upload crop directories ({freed / 1024 / 1024:.1f} MB freed, "
+                  f"{total / 1024 / 1024:.1f} MB kept)")
+        if words:
+            print(f"🧹 Crop GC removed {words} unused OCR word entries")
+        return {'removed': removed, 'freed': freed, 'remaining': total, 'words': words}
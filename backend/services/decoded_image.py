@@ -0,0 +1,115 @@
+import os
+import cv2
+import numpy as np
+
+try:
+    # Sequential decoding, so strips never need the whole image in memory. Listed in
+    # requirements.txt; also needs the libvips system library (see the Dockerfile)
+    import pyvips
+except (ImportError, OSError):
+    pyvips = None
+
+
+class DecodedImage:
+    """
+    An uploaded image decoded once and shared across the analysis pipeline.
+
+    Holds the BGR pixel buffer (OpenCV channel order), a lazily computed
+    grayscale plane and the image dimensions. Stages take NumPy views of these
+    buffers instead of re-reading and re-decoding the file.
+    """
+
+    def __init__(self, pixels, path=None):
+        self.pixels = pixels
+        self.path = path
+        self.height, self.width = pixels.shape[:2]
+        self._gray = None
+
+    @classmethod
+    def open(cls, path):
+        """Decode an image file. Raises ValueError if the file cannot be decoded."""
+        pixels = cv2.imdecode(np.fromfile(path, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if pixels is None:
+            raise ValueError(f"Could not decode image at {path}")
+        return cls(pixels, path)
+
+    @classmethod
+    def load(cls, source):
+        """Return source unchanged if it is already decoded, otherwise decode the file at that path."""
+        if isinstance(source, cls):
+            return source
+        return cls.open(source)
+
+    @property
+    def size(self):
+        """(width, height), matching PIL's Image.size."""
+        return self.width, self.height
+
+    @property
+    def name(self):
+        """Base filename without extension, used to name derived files."""
+        return os.path.splitext(os.path.basename(self.path or 'image'))[0]
+
+    @property
+    def gray(self):
+        """Grayscale plane, computed on first use and shared afterwards."""
+        if self._gray is None:
+            self._gray = cv2.cvtColor(self.pixels, cv2.COLOR_BGR2GRAY)
+        return self._gray
+
+    def region(self, x, y, width, height):
+        """Zero-copy BGR view of a rectangle, clipped to the image bounds."""
+        return self.pixels[max(0, y):y + height, max(0, x):x + width]
+
+
+def iter_gray_strips(source, strip_height=1024):
+    """
+    Yield an image as consecutive grayscale strips, top to bottom.
+
+    With pyvips installed, files are decoded with sequential access and only
+    about one strip of pixels is held at a time, so memory depends on the page
+    width rather than its height. Without it (pyvips or libvips missing) the
+    file is decoded straight to a single grayscale plane (a third of the BGR
+    decode, but still proportional to the page height) and sliced into views;
+    the decoder's own luma conversion can differ from cvtColor by one level.
+
+    Args:
+        source: Image path or DecodedImage
+        strip_height: Rows per strip (the last strip may be shorter)
+
+    Yields:
+        2-D uint8 NumPy arrays of shape (rows, width)
+    """
+    if isinstance(source, DecodedImage):
+        gray = source.gray
+    elif pyvips is not None:
+        yield from _iter_vips_gray_strips(source, strip_height)
+        return
+    else:
+        # imread decodes from the file without holding the compressed bytes in memory
+        gray = cv2.imread(source, cv2.IMREAD_GRAYSCALE)
+        if gray is None:
+            raise ValueError(f"Could not decode image at {source}")
+
+    for y in range(0, gray.shape[0], strip_height):
+        yield gray[y:y + strip_height]
+
+
+def _iter_vips_gray_strips(path, strip_height):
+    try:
+        image = pyvips.Image.new_from_file(path, access='sequential')
+    except pyvips.Error as e:
+        raise ValueError(f"Could not decode image at {path}: {e}")
+    if image.format != 'uchar':
+        image = image.cast('uchar', shift=image.format == 'ushort')
+    if image.hasalpha():
+        image = image.flatten(background=[255] * (image.bands - 1))
+    # Same luma weights as the cv2 decode path (BGR2GRAY)
+    rgb = image.bands >= 3
+
+    for y in range(0, image.height, strip_height):
+        rows = min(strip_height, image.height - y)
+        strip = image.crop(0, y, image.width, rows)
+        pixels = np.ndarray(buffer=strip.write_to_memory(), dtype=np.uint8,
+                            shape=(rows, image.width, strip.bands))
+        yield cv2.cvtColor(pixels[:, :, :3], cv2.COLOR_RGB2GRAY) if rgb else pixels[:, :, 0]
@@ -0,0 +1,119 @@
+import os
+import cv2
+from PIL import Image
+from services.decoded_image import DecodedImage
+
+
+class ImagePayloadPolicy:
+    """
+    Decides which image bytes accompany a Gemini section-analysis prompt.
+
+    The page is downscaled to a pixel budget and re-encoded (JPEG/WebP/PNG)
+    before upload. Optionally, crops of the largest sections are attached at
+    higher resolution so the overview can be kept small. With format
+    'original' the full-resolution page is sent unchanged, as before.
+
+    Configured via environment variables:
+        GEMINI_IMAGE_FORMAT         jpeg | webp | png | original (default jpeg)
+        GEMINI_IMAGE_MAX_PIXELS     pixel budget for the overview (default 8000000)
+        GEMINI_IMAGE_QUALITY        JPEG/WebP quality 1-100 (default 85)
+        GEMINI_IMAGE_SECTION_CROPS  number of largest-section crops to add (default 0)
+    """
+
+    ENCODINGS = {
+        'jpeg': ('.jpg', 'image/jpeg', cv2.IMWRITE_JPEG_QUALITY),
+        'webp': ('.webp', 'image/webp', cv2.IMWRITE_WEBP_QUALITY),
+        'png': ('.png', 'image/png', None),
+    }
+
+    def __init__(self, image_format=None, max_pixels=None, quality=None, section_crops=None):
+        self.image_format = (image_format or os.getenv('GEMINI_IMAGE_FORMAT', 'jpeg')).lower()
+        self.max_pixels = max_pixels or int(os.getenv('GEMINI_IMAGE_MAX_PIXELS', 8000000))
+        self.quality = quality or int(os.getenv('GEMINI_IMAGE_QUALITY', 85))
+        self.section_crops = section_crops if section_crops is not None else int(os.getenv('GEMINI_IMAGE_SECTION_CROPS', 0))
+
+        if self.image_format != 'original' and self.image_format not in self.ENCODINGS:
+            print(f"⚠️  Unknown GEMINI_IMAGE_FORMAT '{self.image_format}', using jpeg")
+            self.image_format = 'jpeg'
+
+    def params(self):
+        """Settings that affect what Gemini sees (part of the analysis cache key)."""
+        return {
+            'format': self.image_format,
+            'max_pixels': self.max_pixels,
+            'quality': self.quality,
+            'section_crops': self.section_crops,
+        }
+
+    def _fit(self, pixels, max_pixels):
+        """Downscale a BGR array so it has at most max_pixels pixels."""
+        height, width = pixels.shape[:2]
+        if width * height <= max_pixels:
+            return pixels
+        scale = (max_pixels / float(width * height)) ** 0.5
+        size = (max(1, int(width * scale)), max(1, int(height * scale)))
+        return cv2.resize(pixels, size, interpolation=cv2.INTER_AREA)
+
+    def _encode(self, pixels):
+        """Encode a BGR array into a Gemini inline-data part."""
+        extension, mime_type, quality_flag = self.ENCODINGS[self.image_format]
+        params = [quality_flag, self.quality] if quality_flag is not None else [cv2.IMWRITE_PNG_COMPRESSION, 3]
+        ok, buffer = cv2.imencode(extension, pixels, params)
+        if not ok:
+            raise ValueError(f"Could not encode image as {self.image_format}")
+        return {'mime_type': mime_type, 'data': buffer.tobytes()}
+
+    def _original_part(self, image):
+        """The uploaded file's own bytes, as the SDK sends an opened image file."""
+        if image.path and os.path.isfile(image.path):
+            with Image.open(image.path) as opened:
+                mime_type = opened.get_format_mimetype() or 'application/octet-stream'
+            with open(image.path, 'rb') as f:
+                return {'mime_type': mime_type, 'data': f.read()}
+        ok, buffer = cv2.imencode('.png', image.pixels)
+        if not ok:
+            raise ValueError("Could not encode image as png")
+        return {'mime_type': 'image/png', 'data': buffer.tobytes()}
+
+    def _largest_sections(self, sections):
+        with_coords = [s for s in sections if s.get('pixel_coords')]
+        with_coords.sort(key=lambda s: s['pixel_coords']['width'] * s['pixel_coords']['height'], reverse=True)
+        return with_coords[:self.section_crops]
+
+    def build_parts(self, image, sections=()):
+        """
+        Build the image parts for a generate_content call.
+
+        Args:
+            image: DecodedImage (or path) of the page
+            sections: Grouped sections with pixel_coords, used for section crops
+
+        Returns:
+            List of content parts (images, plus captions for section crops)
+        """
+        image = DecodedImage.load(image)
+
+        if self.image_format == 'original':
+            part = self._original_part(image)
+            print(f"📦 Gemini image payload: {len(part['data']) / 1024:.0f} KB "
+                  f"(original {image.width}x{image.height} {part['mime_type']} page)")
+            return [part]
+
+        overview = self._fit(image.pixels, self.max_pixels)
+        parts = [self._encode(overview)]
+        payload_bytes = len(parts[0]['data'])
+
+        crops = self._largest_sections(sections) if self.section_crops > 0 else []
+        for section in crops:
+            coords = section['pixel_coords']
+            region = image.region(coords['x'], coords['y'], coords['width'], coords['height'])
+            if region.size == 0:
+                continue
+            part = self._encode(self._fit(region, self.max_pixels // max(1, len(crops))))
+            parts.append(f"Close-up of {section.get('section_id', 'section')}:")
+            parts.append(part)
+            payload_bytes += len(part['data'])
+
+        print(f"📦 Gemini image payload: {payload_bytes / 1024:.0f} KB "
+              f"({overview.shape[1]}x{overview.shape[0]} {self.image_format} overview, {len(crops)} section crops)")
+        return parts
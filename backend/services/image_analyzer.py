@@ -1,14 +1,65 @@
 import os
-import base64
 from openai import OpenAI
 import google.generativeai as genai
-import pytesseract
-from PIL import Image as PILImage
-from PIL import Image
 import json
+import time
+import atexit
+import threading
+import multiprocessing
 import cv2
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from services.layout_segmenter import LayoutSegmenter
+from services.word_index import WordIndex
+from services.decoded_image import DecodedImage
+from services.gemini_payload import ImagePayloadPolicy
+from services.ocr_backends import create_ocr_backend
+from services.json_stream import JSONArrayStreamDecoder
+
+def preprocess_for_ocr(gray, method='otsu', scale=1.0):
+    """
+    Prepare a grayscale page for Tesseract.
+
+    Args:
+        gray: Grayscale page as a NumPy array
+        method: 'otsu' (global threshold), 'adaptive' (local Gaussian threshold)
+                or 'none' (plain grayscale)
+        scale: Resize factor applied before thresholding
+
+    Returns:
+        Preprocessed page as a NumPy array (scaled by scale)
+    """
+    if scale != 1.0:
+        interpolation = cv2.INTER_AREA if scale < 1.0 else cv2.INTER_CUBIC
+        gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interpolation)
+    if method == 'otsu':
+        # Otsu's method automatically finds an optimal global threshold value
+        _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        return binary
+    if method == 'adaptive':
+        # Local thresholds cope with text on differently colored section backgrounds
+        return cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
+                                     cv2.THRESH_BINARY, 31, 15)
+    return gray
+
+
+# OCR backend of a tiled-OCR worker process, created on its first strip and reused
+_strip_backend = None
+
+
+def _ocr_strip(job):
+    """Run Tesseract over a single horizontal strip. Executed inside a worker process."""
+    global _strip_backend
+    strip, backend_name, psm = job
+    try:
+        if _strip_backend is None:
+            _strip_backend = create_ocr_backend(backend_name, pool_size=1)
+        return _strip_backend.image_to_data(strip, psm=psm)
+    except Exception as e:
+        # Some OCR exceptions cannot be unpickled, which would break the whole pool
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
 
 class ImageAnalyzer:
     def __init__(self):
@@ -20,14 +71,12 @@ class ImageAnalyzer:
             self.openai_client = None
             print("⚠️  OpenAI API key not found")
         
-        # Tesseract OCR setup
-        try:
-            # Test if tesseract is available
-            pytesseract.get_tesseract_version()
-            print("✅ Tesseract OCR initialized")
+        # Tesseract OCR setup (pooled tesserocr engines when installed, else pytesseract)
+        self.ocr_backend = create_ocr_backend()
+        if self.ocr_backend.is_available():
+            print(f"✅ Tesseract OCR initialized ({self.ocr_backend.name})")
             self.tesseract_available = True
-        except Exception as e:
-            print(f"⚠️  Tesseract OCR not available: {e}")
+        else:
             print("   Install with: brew install tesseract (macOS) or apt-get install tesseract-ocr (Linux)")
             self.tesseract_available = False
         
@@ -40,85 +89,309 @@ class ImageAnalyzer:
         else:
             self.gemini_model = None
             print("⚠️  Gemini API key not found")
+
+        # OCR strategy: 'page' (single Tesseract call), 'tiled' (overlapping strips
+        # OCR'd in a process pool), 'blocks' (only the detected layout blocks, in
+        # parallel) or 'auto' (tiled only for tall pages)
+        self.ocr_strategy = os.getenv('OCR_STRATEGY', 'auto')
+        self.ocr_psm = int(os.getenv('OCR_PSM', 3))
+        # Binarization ('otsu', 'adaptive', 'none') and resize factor applied before OCR;
+        # see benchmarks/bench_ocr_preprocessing.py for speed/recall trade-offs
+        self.ocr_preprocess = os.getenv('OCR_PREPROCESS', 'otsu')
+        self.ocr_scale = float(os.getenv('OCR_SCALE', 1.0))
+        self.ocr_tile_height = int(os.getenv('OCR_TILE_HEIGHT', 2000))
+        self.ocr_tile_overlap = int(os.getenv('OCR_TILE_OVERLAP', 150))
+        self.ocr_workers = int(os.getenv('OCR_WORKERS', os.cpu_count() or 1))
+        # Workers are never forked from this (multi-threaded) server process
+        self.ocr_pool_start_method = os.getenv('OCR_POOL_START_METHOD', 'forkserver')
+        self._ocr_process_pool = None
+        self._ocr_pool_lock = threading.Lock()
+        atexit.register(self.close)
+
+        # Controls image size/encoding sent along with the Gemini prompt
+        self.image_payload_policy = ImagePayloadPolicy()
+        # Stream the section analysis and decode sections as they arrive
+        self.gemini_streaming = os.getenv('GEMINI_STREAMING', '1') != '0'
+        # Section lists whose estimated output exceeds this are split across concurrent calls
+        self.gemini_shard_tokens = int(os.getenv('GEMINI_SHARD_TOKENS', 6000))
+        self.gemini_shard_workers = int(os.getenv('GEMINI_SHARD_WORKERS', 4))
     
         self.layout_segmenter = LayoutSegmenter()
 
-    def _preprocess_for_ocr(self, image_path):
-        """Preprocess image to improve OCR accuracy."""
+    def _preprocess_for_ocr(self, image):
+        """
+        Preprocess image to improve OCR accuracy.
+
+        Args:
+            image: DecodedImage (or path) of the page
+
+        Returns:
+            Binarized grayscale page as a NumPy array, resized by self.ocr_scale
+        """
+        image = DecodedImage.load(image)
         try:
-            # Read the image with OpenCV
-            image = cv2.imread(image_path)
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            binary = preprocess_for_ocr(image.gray, self.ocr_preprocess, self.ocr_scale)
             
-            # Apply Otsu's thresholding which automatically finds an optimal threshold value
-            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
-            
-            print("✅ Image preprocessed for OCR with Otsu's method")
-            # Return the processed PIL image for tesseract
-            return Image.fromarray(binary)
+            print(f"✅ Image preprocessed for OCR ({self.ocr_preprocess}, scale {self.ocr_scale})")
+            return binary
 
         except Exception as e:
             print(f"⚠️  Could not preprocess image: {e}")
-            # Fallback to original image
-            return PILImage.open(image_path)
+            # Fallback to the plain grayscale image
+            return preprocess_for_ocr(image.gray, 'none', self.ocr_scale)
+
+    def _rescale_words(self, words):
+        """Map word boxes from the OCR scale back to page pixels."""
+        if self.ocr_scale == 1.0:
+            return words
+        factor = 1.0 / self.ocr_scale
+        for word in words:
+            for key in ('x', 'y', 'width', 'height'):
+                word[key] = int(round(word[key] * factor))
+        return words
+
+    def _parse_tesseract_data(self, data, offset_y=0):
+        """Convert OCR backend word arrays into text elements, shifting boxes by offset_y."""
+        text_elements = []
+        for i in np.flatnonzero(np.asarray(data['conf'], dtype=np.float64) >= 31):
+            text = data['text'][i].strip()
+            if text:
+                text_elements.append({
+                    'text': text,
+                    'x': int(data['left'][i]),
+                    'y': int(data['top'][i]) + offset_y,
+                    'width': int(data['width'][i]),
+                    'height': int(data['height'][i])
+                })
+        return text_elements
+
+    def _use_tiled_ocr(self, img_height):
+        """Decide whether the page should be OCR'd in overlapping strips."""
+        if self.ocr_strategy == 'tiled':
+            return img_height > self.ocr_tile_height
+        if self.ocr_strategy == 'auto':
+            return img_height > 2 * self.ocr_tile_height and self.ocr_workers > 1
+        return False
 
-    def _extract_text_with_tesseract(self, image_path):
+    def _strip_ranges(self, img_height):
         """
-        Extracts all text elements from an image using Tesseract OCR.
+        Split the page height into overlapping strips.
+
+        Returns:
+            List of (start_y, end_y, owned_start_y, owned_end_y) tuples. A word belongs to
+            the strip whose owned band contains its vertical center, so every word is kept
+            exactly once as long as text lines are shorter than the overlap.
+        """
+        tile = self.ocr_tile_height
+        overlap = min(self.ocr_tile_overlap, tile // 2)
+        step = tile - overlap
+
+        starts = [0]
+        while starts[-1] + tile < img_height:
+            starts.append(starts[-1] + step)
+
+        ranges = []
+        for i, start in enumerate(starts):
+            end = min(start + tile, img_height)
+            owned_start = 0 if i == 0 else start + overlap // 2
+            owned_end = img_height if i == len(starts) - 1 else starts[i + 1] + overlap // 2
+            ranges.append((start, end, owned_start, owned_end))
+        return ranges
+
+    def _merge_strip_words(self, strip_words, ranges):
+        """
+        Merge per-strip OCR results into one list of text elements.
+
+        Words are kept by center ownership, then words cut in half by a strip edge are
+        dropped when a more complete copy was read by the neighbouring strip.
+        """
+        owned = []
+        for words, (_, _, owned_start, owned_end) in zip(strip_words, ranges):
+            for word in words:
+                center_y = word['y'] + word['height'] / 2
+                if owned_start <= center_y < owned_end:
+                    owned.append(word)
+
+        # Only words touching an overlap band can be duplicates
+        bands = [(start, prev_end) for (start, _, _, _), (_, prev_end, _, _) in zip(ranges[1:], ranges)]
+
+        def in_band(word):
+            return any(word['y'] < band_end and word['y'] + word['height'] > band_start
+                       for band_start, band_end in bands)
+
+        candidates = sorted((w for w in owned if in_band(w)),
+                            key=lambda w: w['width'] * w['height'], reverse=True)
+        dropped = set()
+        for i, word in enumerate(candidates):
+            if id(word) in dropped:
+                continue
+            for other in candidates[i + 1:]:
+                if id(other) in dropped:
+                    continue
+                ix = min(word['x'] + word['width'], other['x'] + other['width']) - max(word['x'], other['x'])
+                iy = min(word['y'] + word['height'], other['y'] + other['height']) - max(word['y'], other['y'])
+                if ix <= 0 or iy <= 0:
+                    continue
+                smaller_area = max(1, other['width'] * other['height'])
+                if (ix * iy) / smaller_area > 0.5:
+                    dropped.add(id(other))
+
+        merged = [w for w in owned if id(w) not in dropped]
+        merged.sort(key=lambda t: (t['y'], t['x']))
+        return merged
+
+    def _ocr_pool_context(self):
+        method = self.ocr_pool_start_method
+        if method not in multiprocessing.get_all_start_methods():
+            method = 'spawn'
+        context = multiprocessing.get_context(method)
+        if method == 'forkserver':
+            # Workers fork from a single-threaded server with this module already imported
+            context.set_forkserver_preload([__name__])
+        return context
+
+    def _get_ocr_process_pool(self):
+        """The tiled-OCR process pool, kept for the analyzer's lifetime so worker engines stay loaded."""
+        with self._ocr_pool_lock:
+            if self._ocr_process_pool is None:
+                self._ocr_process_pool = ProcessPoolExecutor(
+                    max_workers=max(1, self.ocr_workers),
+                    mp_context=self._ocr_pool_context()
+                )
+            return self._ocr_process_pool
+
+    def _discard_ocr_process_pool(self, pool):
+        with self._ocr_pool_lock:
+            if self._ocr_process_pool is pool:
+                self._ocr_process_pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def close(self):
+        """Shut down the tiled-OCR worker processes (registered with atexit)."""
+        with self._ocr_pool_lock:
+            pool, self._ocr_process_pool = self._ocr_process_pool, None
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+
+    def _extract_text_tiled(self, binary):
+        """
+        OCR a tall page as overlapping horizontal strips in a process pool.
+
+        Args:
+            binary: Preprocessed grayscale page as a NumPy array
+
+        Returns:
+            List of text elements in page coordinates
+        """
+        ranges = self._strip_ranges(binary.shape[0])
+        jobs = [(binary[start:end], self.ocr_backend.name, self.ocr_psm) for start, end, _, _ in ranges]
+        print(f"🧩 Tiled OCR: {len(jobs)} strips of {self.ocr_tile_height}px across {self.ocr_workers} workers")
+
+        pool = self._get_ocr_process_pool()
+        try:
+            results = list(pool.map(_ocr_strip, jobs))
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM-killed); replace the pool instead of failing every later page
+            print("⚠️  Tiled OCR worker pool broke, restarting it")
+            self._discard_ocr_process_pool(pool)
+            results = list(self._get_ocr_process_pool().map(_ocr_strip, jobs))
+
+        strip_words = [
+            self._parse_tesseract_data(data, offset_y=start)
+            for data, (start, _, _, _) in zip(results, ranges)
+        ]
+        return self._merge_strip_words(strip_words, ranges)
+
+    def _extract_text_with_tesseract(self, image):
+        """
+        Extracts all text elements from an image (DecodedImage or path) using Tesseract OCR.
         This function only extracts text and does not perform clustering.
         """
         if not self.tesseract_available:
             print("❌ Tesseract OCR not available")
             return None
         try:
-            preprocessed_image = self._preprocess_for_ocr(image_path)
+            preprocessed_image = self._preprocess_for_ocr(image)
                 
             print("🔄 Step 2a: Extracting all text elements with OCR...")
-            data = pytesseract.image_to_data(
-                preprocessed_image, 
-                output_type=pytesseract.Output.DICT,
-                config='--psm 3'
-            )
-            
-            text_elements = []
-            for i in range(len(data['text'])):
-                text = data['text'][i].strip()
-                conf = int(data['conf'][i])
-                if conf > 30 and text:
-                    text_elements.append({
-                        'text': text,
-                        'x': data['left'][i],
-                        'y': data['top'][i],
-                        'width': data['width'][i],
-                        'height': data['height'][i]
-                    })
+            if self._use_tiled_ocr(preprocessed_image.shape[0]):
+                text_elements = self._extract_text_tiled(preprocessed_image)
+            else:
+                data = self.ocr_backend.image_to_data(preprocessed_image, psm=self.ocr_psm)
+                text_elements = self._parse_tesseract_data(data)
+            text_elements = self._rescale_words(text_elements)
             print(f"🔍 Found {len(text_elements)} total text elements.")
             return text_elements
         except Exception as e:
             print(f"❌ Error in Tesseract text extraction: {str(e)}")
             return None
 
+    def _block_psm(self, block):
+        """Pick a Tesseract page segmentation mode suited to a layout block's shape."""
+        if block['height'] < 80 and block['width'] > 4 * block['height']:
+            return 7  # Single text line (buttons, nav bars, short headlines)
+        return 6  # Single uniform block of text
+
+    def _ocr_block(self, binary, block):
+        """OCR one layout block of the binarized page and return words in page coordinates."""
+        scale = self.ocr_scale
+        x, y = int(block['x'] * scale), int(block['y'] * scale)
+        w, h = int(block['width'] * scale), int(block['height'] * scale)
+        region = binary[y:y + h, x:x + w]
+        if region.size == 0:
+            return []
+        data = self.ocr_backend.image_to_data(region, psm=self._block_psm(block))
+        words = self._parse_tesseract_data(data, offset_y=y)
+        for word in words:
+            word['x'] += x
+        return self._rescale_words(words)
+
+    def _extract_text_by_blocks(self, image, blocks):
+        """
+        Runs Tesseract only on the detected layout blocks, in parallel.
+
+        Returns:
+            List with one list of text elements per block (same order as blocks),
+            or None if OCR is unavailable or failed.
+        """
+        if not self.tesseract_available:
+            print("❌ Tesseract OCR not available")
+            return None
+        try:
+            binary = self._preprocess_for_ocr(image)
+            workers = max(1, min(self.ocr_workers, len(blocks)))
+            print(f"🔄 Step 2a: OCR of {len(blocks)} layout blocks across {workers} threads...")
+
+            # Both backends do the recognition outside the GIL (tesseract subprocess
+            # or tesserocr), so threads run in parallel
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                words_per_block = list(executor.map(lambda block: self._ocr_block(binary, block), blocks))
+
+            print(f"🔍 Found {sum(len(words) for words in words_per_block)} total text elements.")
+            return words_per_block
+        except Exception as e:
+            print(f"❌ Error in block-scoped Tesseract extraction: {str(e)}")
+            return None
+
     def _map_text_to_blocks(self, blocks, text_elements, image_width, image_height):
         """
         Assigns text elements to the visual blocks they fall within.
         """
-        # Create final sections by mapping text to the detected blocks
+        # A word belongs to a block when its center is strictly inside it
+        words_per_block = WordIndex(text_elements).assign(blocks)
+
+        return self._build_block_sections(blocks, words_per_block, image_width, image_height)
+
+    def _build_block_sections(self, blocks, words_per_block, image_width, image_height):
+        """
+        Builds sections from blocks whose text elements are already attributed to them.
+        """
+        # Create final sections from the blocks that contain text
         final_sections = []
         section_counter = 1  # Always start at 1 for first non-empty section
-        for i, block in enumerate(blocks):
+        for block, contained_text in zip(blocks, words_per_block):
             block_x, block_y, block_w, block_h = block['x'], block['y'], block['width'], block['height']
-            
-            contained_text = []
-            for text in text_elements:
-                # Check if the text center is inside the block
-                text_center_x = text['x'] + text['width'] / 2
-                text_center_y = text['y'] + text['height'] / 2
-                if (block_x < text_center_x < block_x + block_w) and \
-                   (block_y < text_center_y < block_y + block_h):
-                    contained_text.append(text)
-            
+
             # Sort text in natural reading order (top-to-bottom, left-to-right)
             contained_text.sort(key=lambda t: (t['y'], t['x']))
             combined_text = ' '.join([t['text'] for t in contained_text])
@@ -155,46 +428,102 @@ class ImageAnalyzer:
         """
         New Pipeline: Detect layout blocks, then map text to them.
         """
+        return self.analyze_page(image_path)['sections']
+
+    def pipeline_params(self):
+        """Parameters that change analysis output; used to key cached analysis results."""
+        return {
+            'ocr_strategy': self.ocr_strategy,
+            'ocr_backend': self.ocr_backend.name,
+            'ocr_psm': self.ocr_psm,
+            'ocr_preprocess': self.ocr_preprocess,
+            'ocr_scale': self.ocr_scale,
+            'layout_mode': self.layout_segmenter.layout_mode,
+            'layout_detect_scale': self.layout_segmenter.detect_scale,
+            'layout_detect_refine': self.layout_segmenter.detect_refine,
+            'layout_merge_iou': self.layout_segmenter.merge_iou,
+            'layout_merge_containment': self.layout_segmenter.merge_containment,
+            'ocr_tile_height': self.ocr_tile_height,
+            'ocr_tile_overlap': self.ocr_tile_overlap,
+            'gemini_model': self.gemini_model.model_name if self.gemini_model else None,
+            'gemini_image': self.image_payload_policy.params(),
+            'gemini_shard_tokens': self.gemini_shard_tokens,
+        }
+
+    def analyze_page(self, image_path):
+        """
+        Run the full analysis pipeline and keep its intermediate results.
+
+        Args:
+            image_path: Path to the image, or a DecodedImage to reuse an existing decode
+
+        Returns:
+            Dict with:
+                sections: Analyzed sections (same as analyze_page_sections)
+                text_elements: OCR word boxes in pixel coordinates
+                image_size: Dict with width and height in pixels
+                complete: True when Gemini analysed every section, i.e. the
+                          result is safe to cache
+        """
+        result = {'sections': [], 'text_elements': [], 'image_size': None, 'complete': False}
         print("🚀 Starting new layout-based analysis pipeline...")
         try:
-            image = PILImage.open(image_path)
+            # Decode once; every stage below works on views of this buffer
+            image = DecodedImage.load(image_path)
             img_width, img_height = image.size
+            result['image_size'] = {'width': img_width, 'height': img_height}
 
             # Step 1: Detect visual layout blocks using the LayoutSegmenter
             print("🔍 Step 1: Detecting visual layout blocks...")
-            visual_blocks = self.layout_segmenter.detect_visual_blocks(image_path)
+            visual_blocks = self.layout_segmenter.detect_blocks(image)
             if not visual_blocks:
                 print("❌ No visual blocks detected. Cannot proceed.")
                 # Return a single section for the whole page as a fallback
                 visual_blocks = [{'x': 0, 'y': 0, 'width': img_width, 'height': img_height}]
 
-            # Step 2: Extract all text elements using Tesseract
-            print("\n🔍 Step 2: Extracting all text from image...")
-            text_elements = self._extract_text_with_tesseract(image_path)
-            if not text_elements:
-                print("❌ No text extracted from image. Cannot map to blocks.")
-                return [] # Or handle as imag-only sections
+            if self.ocr_strategy == 'blocks':
+                # Step 2+3: OCR each block separately; words come back already attributed
+                print("\n🔍 Step 2: Extracting text from visual blocks...")
+                words_per_block = self._extract_text_by_blocks(image, visual_blocks)
+                if not words_per_block or not any(words_per_block):
+                    print("❌ No text extracted from image. Cannot map to blocks.")
+                    return result
+                result['text_elements'] = [word for words in words_per_block for word in words]
+                sections_with_text = self._build_block_sections(visual_blocks, words_per_block, img_width, img_height)
+            else:
+                # Step 2: Extract all text elements using Tesseract
+                print("\n🔍 Step 2: Extracting all text from image...")
+                text_elements = self._extract_text_with_tesseract(image)
+                if not text_elements:
+                    print("❌ No text extracted from image. Cannot map to blocks.")
+                    return result # Or handle as imag-only sections
+                result['text_elements'] = text_elements
 
-            # Step 3: Map text to the detected visual blocks
-            print("\n🔍 Step 3: Mapping text to visual blocks...")
-            sections_with_text = self._map_text_to_blocks(visual_blocks, text_elements, img_width, img_height)
+                # Step 3: Map text to the detected visual blocks
+                print("\n🔍 Step 3: Mapping text to visual blocks...")
+                sections_with_text = self._map_text_to_blocks(visual_blocks, text_elements, img_width, img_height)
 
             # Step 4: Get copywriting analysis from Gemini for the structured sections
             print("\n🧠 Step 4: Analyzing structured sections with Gemini...")
-            final_analyzed_sections = self.analyze_grouped_sections_with_gemini(sections_with_text, image_path)
+            analysis = self._analyze_sections_with_gemini(sections_with_text, image)
+            final_analyzed_sections = analysis['sections']
 
             if not final_analyzed_sections:
                 print("❌ Gemini analysis failed. Returning sections with raw text.")
-                return sections_with_text
+                result['sections'] = sections_with_text
+                return result
 
             print("✅ Pipeline completed successfully!")
-            return final_analyzed_sections
+            result['sections'] = final_analyzed_sections
+            result['complete'] = analysis['complete']
+            return result
 
         except Exception as e:
             print(f"❌ Error in layout-based analysis pipeline: {e}")
             import traceback
             traceback.print_exc()
-            return [{'id': 'error', 'purpose': f'Error: {e}', 'text': ''}]
+            result['sections'] = [{'id': 'error', 'purpose': f'Error: {e}', 'text': ''}]
+            return result
 
     def analyze_grouped_sections_with_gemini(self, grouped_sections, image_path):
         """
@@ -203,68 +532,126 @@ class ImageAnalyzer:
         
         Args:
             grouped_sections: List of already-grouped sections from algorithmic grouping
-            image_path: Path to original image for visual context
+            image_path: Path to original image (or its DecodedImage) for visual context
             
         Returns:
             List of analyzed sections with copywriting insights
         """
+        return self._analyze_sections_with_gemini(grouped_sections, image_path)['sections']
+
+    def _analyze_sections_with_gemini(self, grouped_sections, image_path):
+        """
+        Gemini analysis that also reports whether the fallback analysis was used.
+        Large section lists are split into shards that are analyzed concurrently.
+
+        Returns:
+            Dict with sections (or None) and complete (False for fallback results)
+        """
         if not self.gemini_model or not grouped_sections:
-            return None
+            return {'sections': None, 'complete': False}
+
+        shards = self._shard_sections(grouped_sections)
+        if len(shards) > 1:
+            return self._analyze_shards_with_gemini(shards, image_path)
+        return self._analyze_shard_with_gemini(grouped_sections, image_path)
+
+    def _estimate_section_tokens(self, section):
+        """
+        Rough output-token estimate for one analyzed section: the echoed
+        current_text (~4 characters per token) plus the analysis fields.
+        """
+        return len(section.get('text', '')) // 4 + 150
+
+    def _shard_sections(self, grouped_sections):
+        """Split sections, in page order, into shards that fit the per-call token budget."""
+        shards = []
+        current = []
+        current_tokens = 0
+        for section in grouped_sections:
+            tokens = self._estimate_section_tokens(section)
+            if current and current_tokens + tokens > self.gemini_shard_tokens:
+                shards.append(current)
+                current = []
+                current_tokens = 0
+            current.append(section)
+            current_tokens += tokens
+        if current:
+            shards.append(current)
+        return shards
+
+    def _shard_image(self, image, shard):
+        """
+        Crop the page to the region covered by a shard's sections.
+
+        Returns:
+            (DecodedImage view of the region, sections with pixel_coords relative to it)
+        """
+        coords = [s['pixel_coords'] for s in shard if s.get('pixel_coords')]
+        if len(coords) < len(shard):
+            return image, shard
+
+        margin = 20
+        x0 = max(0, min(c['x'] for c in coords) - margin)
+        y0 = max(0, min(c['y'] for c in coords) - margin)
+        x1 = min(image.width, max(c['x'] + c['width'] for c in coords) + margin)
+        y1 = min(image.height, max(c['y'] + c['height'] for c in coords) + margin)
+
+        # No path: the region is not the uploaded file, so payloads encode its pixels
+        region = DecodedImage(image.region(x0, y0, x1 - x0, y1 - y0))
+        shifted = [
+            dict(s, pixel_coords=dict(s['pixel_coords'], x=s['pixel_coords']['x'] - x0, y=s['pixel_coords']['y'] - y0))
+            for s in shard
+        ]
+        return region, shifted
+
+    def _analyze_shards_with_gemini(self, shards, image_path):
+        """
+        Analyze shards concurrently, each with the crop of the page it covers,
+        and merge the results back in page order.
+        """
+        image = DecodedImage.load(image_path)
+        workers = max(1, min(self.gemini_shard_workers, len(shards)))
+        print(f"🧩 Sharding {sum(len(s) for s in shards)} sections into {len(shards)} Gemini calls "
+              f"({workers} concurrent)")
+
+        def analyze(shard):
+            region, shard_sections = self._shard_image(image, shard)
+            result = self._analyze_shard_with_gemini(shard_sections, region)
+            analyzed = result['sections'] or []
+            if len(analyzed) < len(shard):
+                # Keep every section in the merged list even if this shard came back short
+                analyzed = analyzed + self._create_fallback_analysis(shard)[len(analyzed):]
+                result = {'sections': analyzed, 'complete': False}
+            return result
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(analyze, shards))
+
+        sections = []
+        for shard, result in zip(shards, results):
+            # Section ids and bounding boxes come from each shard's own grouped sections
+            sections.extend(result['sections'][:len(shard)])
+        return {'sections': sections, 'complete': all(r['complete'] for r in results)}
+
+    def _analyze_shard_with_gemini(self, grouped_sections, image_path):
+        """
+        Single Gemini call (streaming or not) for a list of sections.
+
+        Returns:
+            Dict with sections (or None) and complete (False for fallback results)
+        """
+        if self.gemini_streaming:
+            return self._collect_streamed_sections(grouped_sections, image_path)
             
         try:
-            # Create focused analysis prompt (no spatial grouping needed)
-            sections_summary = "\n".join([
-                f"Section {section.get('section_id', f'section_{i+1}')}: '{section['text']}'"
-                f" [Position: {section['bounding_box']['y']:.1f}% from top, {len(section['text'].split())} words]"
-                for i, section in enumerate(grouped_sections)
-            ])
-
-            prompt = f"""
-            Analyze these {len(grouped_sections)} pre-grouped sections for copywriting effectiveness:
-
-            {sections_summary}
-
-            For each section, provide copywriting analysis in this EXACT JSON format:
-            [{{
-                "id": "section_1",
-                "type": "hero/navigation/content/cta/footer",
-                "purpose": "Specific copywriting purpose of this section",
-                "text_structure": "Required text structure for optimal conversion",
-                "location": "Position description",
-                "current_text": "Exact text from the section",
-                "copywriting_score": 1-10,
-                "improvement_notes": "Specific copywriting improvements needed"
-            }}]
-
-            Focus purely on copywriting effectiveness - the spatial grouping is already optimized.
-            Be specific about WHY certain copywriting approaches would work better.
-            
-            EXAMPLE structure:
-             [{{
-                 "id": "section_1",
-                 "type": "hero",
-                 "purpose": "Primary value proposition to hook visitors and communicate core benefit",
-                 "text_structure": "Headline + subheadline + primary benefit + social proof element",
-                 "location": "Top of page",
-                 "current_text": "...",
-                 "copywriting_score": 7,
-                 "improvement_notes": "Could be stronger with more specific benefit and urgency"
-             }}]
-            """
-            
-            # Upload image to Gemini for visual context
-            import PIL.Image
-            pil_image = PIL.Image.open(image_path)
+            prompt = self._build_section_prompt(grouped_sections)
+
+            # Upload image to Gemini for visual context, sized by the payload policy
+            image_parts = self.image_payload_policy.build_parts(image_path, grouped_sections)
             
-            # Configure Gemini with higher token limits and better settings
-            import google.generativeai as genai
             response = self.gemini_model.generate_content(
-                [prompt, pil_image],
-                generation_config=genai.types.GenerationConfig(
-                    max_output_tokens=8192,  # Increased to max to prevent truncation
-                    temperature=0.3,
-                    candidate_count=1,
-                )
+                [prompt] + image_parts,
+                generation_config=self._gemini_generation_config()
             )
             
             # Parse response with better error handling
@@ -289,7 +676,7 @@ class ImageAnalyzer:
                     else:
                         print("❌ Could not find valid JSON array in Gemini response")
                         print(f"Response preview: {response_text[:500]}...")
-                        return None
+                        return {'sections': None, 'complete': False}
                 
                 # Attempt to parse, and if it fails, try to repair.
                 try:
@@ -316,16 +703,11 @@ class ImageAnalyzer:
 
                 # Add bounding boxes from original grouped sections
                 for i, section in enumerate(sections):
-                    if i < len(grouped_sections):
-                        section['bounding_box'] = grouped_sections[i]['bounding_box']
-                    else:
-                        section['bounding_box'] = {"x": 0, "y": 0, "width": 100, "height": 100}
-
-                    # Make sure to preserve the original section_id
-                    section['id'] = grouped_sections[i].get('section_id', f"section_{i+1}")
+                    self._attach_section_geometry(section, i, grouped_sections)
                 
                 print(f"✅ Gemini provided copywriting analysis for {len(sections)} sections")
-                return sections
+                # A repaired (truncated) response is usable but not worth caching
+                return {'sections': sections, 'complete': len(sections) >= len(grouped_sections)}
                     
             except json.JSONDecodeError as e:
                 print(f"❌ JSON parsing error: {e}")
@@ -334,13 +716,145 @@ class ImageAnalyzer:
                 
                 # Fallback: return sections with basic analysis
                 print("🔄 Using fallback analysis...")
-                return self._create_fallback_analysis(grouped_sections)
+                return {'sections': self._create_fallback_analysis(grouped_sections), 'complete': False}
                 
         except Exception as e:
             print(f"❌ Error with Gemini copywriting analysis: {str(e)}")
             print(f"🔄 Using fallback analysis...")
-            return self._create_fallback_analysis(grouped_sections)
+            return {'sections': self._create_fallback_analysis(grouped_sections), 'complete': False}
     
+    def _build_section_prompt(self, grouped_sections):
+        """Build the copywriting analysis prompt for a list of grouped sections."""
+        # Create focused analysis prompt (no spatial grouping needed)
+        sections_summary = "\n".join([
+            f"Section {section.get('section_id', f'section_{i+1}')}: '{section['text']}'"
+            f" [Position: {section['bounding_box']['y']:.1f}% from top, {len(section['text'].split())} words]"
+            for i, section in enumerate(grouped_sections)
+        ])
+
+        prompt = f"""
+        Analyze these {len(grouped_sections)} pre-grouped sections for copywriting effectiveness:
+
+        {sections_summary}
+
+        For each section, provide copywriting analysis in this EXACT JSON format:
+        [{{
+            "id": "section_1",
+            "type": "hero/navigation/content/cta/footer",
+            "purpose": "Specific copywriting purpose of this section",
+            "text_structure": "Required text structure for optimal conversion",
+            "location": "Position description",
+            "current_text": "Exact text from the section",
+            "copywriting_score": 1-10,
+            "improvement_notes": "Specific copywriting improvements needed"
+        }}]
+
+        Focus purely on copywriting effectiveness - the spatial grouping is already optimized.
+        Be specific about WHY certain copywriting approaches would work better.
+        
+        EXAMPLE structure:
+         [{{
+             "id": "section_1",
+             "type": "hero",
+             "purpose": "Primary value proposition to hook visitors and communicate core benefit",
+             "text_structure": "Headline + subheadline + primary benefit + social proof element",
+             "location": "Top of page",
+             "current_text": "...",
+             "copywriting_score": 7,
+             "improvement_notes": "Could be stronger with more specific benefit and urgency"
+         }}]
+        """
+        return prompt
+
+    def _gemini_generation_config(self):
+        # Configure Gemini with higher token limits and better settings
+        return genai.types.GenerationConfig(
+            max_output_tokens=8192,  # Increased to max to prevent truncation
+            temperature=0.3,
+            candidate_count=1,
+        )
+
+    def _attach_section_geometry(self, section, index, grouped_sections):
+        """Copy the bounding box and section_id of the matching grouped section onto a Gemini result."""
+        if index < len(grouped_sections):
+            section['bounding_box'] = grouped_sections[index]['bounding_box']
+            # Make sure to preserve the original section_id
+            section['id'] = grouped_sections[index].get('section_id', f"section_{index+1}")
+        else:
+            section['bounding_box'] = {"x": 0, "y": 0, "width": 100, "height": 100}
+            section['id'] = f"section_{index+1}"
+        return section
+
+    def stream_grouped_sections_with_gemini(self, grouped_sections, image_path):
+        """
+        Streaming variant of analyze_grouped_sections_with_gemini.
+
+        Uses Gemini's streaming API and decodes the JSON array incrementally,
+        yielding each analyzed section (with its bounding box and id attached)
+        as soon as its object is complete. If the stream is cut off, every
+        section completed before the cut has already been yielded.
+
+        Args:
+            grouped_sections: List of already-grouped sections from algorithmic grouping
+            image_path: Path to original image (or its DecodedImage) for visual context
+
+        Yields:
+            Analyzed section dicts, in response order
+        """
+        if not self.gemini_model or not grouped_sections:
+            return
+
+        prompt = self._build_section_prompt(grouped_sections)
+        image_parts = self.image_payload_policy.build_parts(image_path, grouped_sections)
+
+        started = time.perf_counter()
+        response = self.gemini_model.generate_content(
+            [prompt] + image_parts,
+            generation_config=self._gemini_generation_config(),
+            stream=True
+        )
+
+        decoder = JSONArrayStreamDecoder()
+        index = 0
+        for chunk in response:
+            try:
+                text = chunk.text
+            except ValueError:
+                # Chunks without text parts (e.g. the final finish_reason chunk)
+                continue
+            for element in decoder.feed(text):
+                if not isinstance(element, dict):
+                    continue
+                if index == 0:
+                    print(f"⏱️  First streamed section after {time.perf_counter() - started:.2f}s")
+                yield self._attach_section_geometry(element, index, grouped_sections)
+                index += 1
+
+        print(f"✅ Gemini streamed {index} sections in {time.perf_counter() - started:.2f}s")
+
+    def _collect_streamed_sections(self, grouped_sections, image_path):
+        """
+        Run the streaming analysis to completion, keeping every complete section
+        even if the stream fails or is truncated part-way.
+        """
+        sections = []
+        try:
+            for section in self.stream_grouped_sections_with_gemini(grouped_sections, image_path):
+                sections.append(section)
+        except Exception as e:
+            print(f"❌ Gemini stream interrupted after {len(sections)} sections: {str(e)}")
+
+        if not sections:
+            print("🔄 Using fallback analysis...")
+            return {'sections': self._create_fallback_analysis(grouped_sections), 'complete': False}
+
+        if len(sections) < len(grouped_sections):
+            print(f"⚠️ Stream ended early; fallback analysis for {len(grouped_sections) - len(sections)} sections")
+            sections.extend(self._create_fallback_analysis(grouped_sections)[len(sections):])
+            return {'sections': sections, 'complete': False}
+
+        return {'sections': sections, 'complete': True}
+
     def _create_fallback_analysis(self, grouped_sections):
         """Create basic analysis when Gemini fails"""
         fallback_sections = []
@@ -1,14 +1,80 @@
 import os
-from PIL import Image
+import re
+import json
+import hmac
+import hashlib
+import secrets
+import tempfile
+import cv2
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 import base64
-from io import BytesIO
+from services.decoded_image import DecodedImage
+from services.crop_encoding import CropEncodingPolicy
+
+# crops/<upload>/<content token>/<section id>_<x>_<y>_<w>_<h>_<signature>, box in
+# source pixels, signature an HMAC of everything before it (see sign_lazy_crop)
+LAZY_CROP_PATTERN = re.compile(
+    r'^(?P<upload>[\w.-]+)/(?P<token>[0-9a-f]{16})/'
+    r'(?P<section>[\w.-]+)_(?P<x>\d+)_(?P<y>\d+)_(?P<width>\d+)_(?P<height>\d+)_(?P<signature>[0-9a-f]{16})$'
+)
+
+# crops/<upload>/<content token>/atlas_<layout digest>, layout in the matching .json
+SPRITE_ATLAS_PATTERN = re.compile(
+    r'^(?P<upload>[\w.-]+)/(?P<token>[0-9a-f]{16})/atlas_(?P<digest>[0-9a-f]{12})$'
+)
 
 class ImageCropper:
     def __init__(self):
         self.crop_folder = 'uploads/crops'
+        # Threads used to encode the crops of one page concurrently
+        self.crop_workers = int(os.getenv('CROP_WORKERS', os.cpu_count() or 1))
+        self.encoding = CropEncodingPolicy()
+        # 'lazy' returns crop URLs at analysis time and renders each crop on first
+        # request; 'eager' writes every crop before the analysis responds
+        self.crop_mode = os.getenv('CROP_MODE', 'lazy').lower()
+        # Section previews are packed into one sprite atlas per upload; each
+        # preview fits in a square of this many pixels, packed into rows of atlas_width
+        self.sprite_max_size = int(os.getenv('CROP_SPRITE_MAX_SIZE', 480))
+        self.sprite_atlas_width = int(os.getenv('CROP_SPRITE_ATLAS_WIDTH', 2048))
+        self.sprite_padding = 2
+        # Downscaled copies of each crop (longest side in pixels), served via ?size=
+        self.pyramid_sizes = sorted(
+            int(size) for size in os.getenv('CROP_PYRAMID_SIZES', '256,768').split(',') if size.strip()
+        )
+        # Lazy crop URLs are signed, so the crop route only renders boxes an analysis planned
+        self.url_key = self._load_url_key()
         # Ensure crop directory exists
         os.makedirs(self.crop_folder, exist_ok=True)
     
+    def _load_url_key(self):
+        """
+        Key for signing lazy crop URLs.
+
+        CROP_URL_SECRET when set; otherwise a random key generated once into
+        CROP_URL_KEY_FILE (under the private data folder), so every worker
+        process signs and checks with the same key.
+        """
+        secret = os.getenv('CROP_URL_SECRET')
+        if secret:
+            return secret.encode('utf-8')
+        key_path = os.getenv('CROP_URL_KEY_FILE', os.path.join(os.getenv('DATA_FOLDER', 'data'), 'crop_url.key'))
+        key_dir = os.path.dirname(key_path) or '.'
+        os.makedirs(key_dir, exist_ok=True)
+        if not os.path.exists(key_path):
+            fd, tmp_path = tempfile.mkstemp(dir=key_dir, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    f.write(secrets.token_hex(32))
+                # link() never replaces an existing key, so racing workers all keep the first one
+                os.link(tmp_path, key_path)
+            except FileExistsError:
+                pass
+            finally:
+                os.remove(tmp_path)
+        with open(key_path, 'r') as f:
+            return f.read().strip().encode('utf-8')
+
     def validate_and_adjust_coordinates(self, bounding_box, img_width, img_height):
         """
         Validate and adjust bounding box coordinates for better accuracy
@@ -63,12 +129,135 @@ class ImageCropper:
             'height_px': height_px
         }
 
+    def upload_crop_dir(self, upload_name):
+        """Directory holding every crop of one upload (eager crops, plus lazy crops per content token)."""
+        return os.path.join(self.crop_folder, upload_name)
+
+    def _safe_id(self, section_id):
+        return re.sub(r'[^\w.-]', '-', str(section_id))
+
+    def mark_used(self, upload_name):
+        """Refresh an upload's crop directory mtime, which the crop collector uses for LRU eviction."""
+        try:
+            os.utime(self.upload_crop_dir(upload_name), None)
+        except OSError:
+            pass
+
+    def _plan_crop(self, image, section_id, bounding_box):
+        """
+        Validate a bounding box and cut its region out of a decoded image.
+
+        Returns:
+            (region, crop_base): a zero-copy BGR view and the output path without
+            its extension (the encoding policy picks the format)
+        """
+        img_width, img_height = image.size
+        
+        # Validate and adjust coordinates
+        adjusted_coords = self.validate_and_adjust_coordinates(bounding_box, img_width, img_height)
+        
+        x_px = adjusted_coords['x_px']
+        y_px = adjusted_coords['y_px']
+        width_px = adjusted_coords['width_px']
+        height_px = adjusted_coords['height_px']
+        
+        # print(f"🎯 Cropping {section_id}: Original coords {bounding_box}")
+        # print(f"   Adjusted to: x={x_px}, y={y_px}, w={width_px}, h={height_px}")
+        
+        # A view into the decoded buffer; pixels are only copied when encoding
+        region = image.region(x_px, y_px, width_px, height_px)
+        
+        # Generate filename for the cropped section inside the upload's crop directory
+        upload_name = os.path.basename(image.path or 'image')
+        return region, os.path.join(self.upload_crop_dir(upload_name), self._safe_id(section_id))
+
+    def pyramid_level(self, size):
+        """
+        Pyramid level for a requested preview size.
+
+        Args:
+            size: Requested longest side in pixels (str or int), 'full' or None
+
+        Returns:
+            The smallest level at least that large, or None for full resolution
+        """
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            return None
+        for level in self.pyramid_sizes:
+            if level >= size:
+                return level
+        return None
+
+    def _level_base(self, crop_base, level):
+        return f"{crop_base}@{level}" if level else crop_base
+
+    def _iter_pyramid(self, region):
+        """
+        Yield (level, pixels) for every pyramid level smaller than the region.
+
+        Levels are produced largest first, each downscaled from the previous
+        level rather than from the full-resolution region.
+        """
+        pixels = region
+        for level in reversed(self.pyramid_sizes):
+            if level >= max(region.shape[:2]):
+                continue
+            scale = level / float(max(pixels.shape[:2]))
+            size = (max(1, int(round(pixels.shape[1] * scale))), max(1, int(round(pixels.shape[0] * scale))))
+            pixels = cv2.resize(pixels, size, interpolation=cv2.INTER_AREA)
+            yield level, pixels
+
+    def _pyramid_pixels(self, region, level):
+        """Pixels of one pyramid level (None is full resolution), built through the larger levels."""
+        if level is None or level >= max(region.shape[:2]):
+            return region
+        for current, pixels in self._iter_pyramid(region):
+            if current == level:
+                return pixels
+        return region
+
+    def _write_crop(self, region, crop_base):
+        """Encode a region view and its pyramid levels and save them. Both encoders release the GIL while encoding."""
+        crop_format = self.encoding.choose_format(region)
+        extension, data = self.encoding.encode(region, crop_format)
+        # Recrops rewrite these paths while they may be served; never expose a partial file
+        crop_path = self._write_atomic(crop_base, extension, data)
+        written = {crop_path}
+        # Levels share the full crop's format so a section never mixes encodings
+        for level, pixels in self._iter_pyramid(region):
+            _, data = self.encoding.encode(pixels, crop_format)
+            written.add(self._write_atomic(self._level_base(crop_base, level), extension, data))
+
+        # A recrop may switch format or size; drop the section's files in any other format or level
+        for level in [None] + self.pyramid_sizes:
+            for other in self.encoding.extensions:
+                path = self._level_base(crop_base, level) + other
+                if path not in written and os.path.exists(path):
+                    os.remove(path)
+        return crop_path
+
+    def find_crop_level(self, crop_path, level):
+        """
+        Path of a written pyramid level of an eager crop.
+
+        Returns:
+            The level's path when it exists, otherwise crop_path (the crop is
+            already smaller than the level, or was written before pyramids)
+        """
+        if level is None:
+            return crop_path
+        crop_base, extension = os.path.splitext(crop_path)
+        level_path = self._level_base(crop_base, level) + extension
+        return level_path if os.path.exists(level_path) else crop_path
+
     def crop_section(self, image_path, section_id, bounding_box):
         """
         Crop a section from the main image based on bounding box coordinates
         
         Args:
-            image_path: Path to the original image
+            image_path: Path to the original image, or its DecodedImage
             section_id: Unique identifier for the section
             bounding_box: Dict with x, y, width, height as percentages (0-100)
             
@@ -76,34 +265,10 @@ class ImageCropper:
             Path to the cropped image file
         """
         try:
-            # Open the original image
-            with Image.open(image_path) as img:
-                # Get image dimensions
-                img_width, img_height = img.size
-                
-                # Validate and adjust coordinates
-                adjusted_coords = self.validate_and_adjust_coordinates(bounding_box, img_width, img_height)
-                
-                x_px = adjusted_coords['x_px']
-                y_px = adjusted_coords['y_px']
-                width_px = adjusted_coords['width_px']
-                height_px = adjusted_coords['height_px']
-                
-                # print(f"🎯 Cropping {section_id}: Original coords {bounding_box}")
-                # print(f"   Adjusted to: x={x_px}, y={y_px}, w={width_px}, h={height_px}")
-                
-                # Crop the image
-                cropped = img.crop((x_px, y_px, x_px + width_px, y_px + height_px))
-                
-                # Generate filename for the cropped section
-                base_filename = os.path.splitext(os.path.basename(image_path))[0]
-                crop_filename = f"{base_filename}_{section_id}.png"
-                crop_path = os.path.join(self.crop_folder, crop_filename)
-                
-                # Save the cropped image with some optimization
-                cropped.save(crop_path, 'PNG', optimize=True)
-                
-                return crop_path
+            # Reuse the shared decode when available instead of re-opening the file
+            image = DecodedImage.load(image_path)
+            region, crop_base = self._plan_crop(image, section_id, bounding_box)
+            return self._write_crop(region, crop_base)
                 
         except Exception as e:
             print(f"❌ Error cropping section {section_id}: {str(e)}")
@@ -113,8 +278,11 @@ class ImageCropper:
         """
         Crop all sections from an image
         
+        The image is decoded once, every bounding box is validated and cut as a
+        view of the shared buffer, and the crops are encoded concurrently.
+        
         Args:
-            image_path: Path to the original image
+            image_path: Path to the original image, or its DecodedImage
             sections: List of section objects with bounding_box data
             
         Returns:
@@ -122,18 +290,281 @@ class ImageCropper:
         """
         crop_paths = {}
         
+        # Decode once for all sections
+        try:
+            image = DecodedImage.load(image_path)
+        except ValueError as e:
+            print(f"❌ Error cropping sections: {str(e)}")
+            return crop_paths
+
+        jobs = []
         for section in sections:
             if 'bounding_box' in section:
-                crop_path = self.crop_section(
-                    image_path, 
-                    section['id'], 
-                    section['bounding_box']
-                )
-                if crop_path:
-                    crop_paths[section['id']] = crop_path
+                try:
+                    region, crop_base = self._plan_crop(image, section['id'], section['bounding_box'])
+                    jobs.append((section['id'], region, crop_base))
+                except Exception as e:
+                    print(f"❌ Error cropping section {section['id']}: {str(e)}")
+        if not jobs:
+            return crop_paths
+
+        def write(job):
+            section_id, region, crop_base = job
+            try:
+                return self._write_crop(region, crop_base)
+            except Exception as e:
+                print(f"❌ Error cropping section {section_id}: {str(e)}")
+                return None
+
+        workers = max(1, min(self.crop_workers, len(jobs)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            written = list(executor.map(write, jobs))
+
+        for (section_id, _, _), crop_path in zip(jobs, written):
+            if crop_path:
+                crop_paths[section_id] = crop_path
         
         return crop_paths
     
+    def plan_lazy_crops(self, upload_name, image_size, sections, token):
+        """
+        Assign crop URLs to sections without cutting or encoding any pixels.
+
+        Each path encodes the upload, a content token and the validated pixel
+        box, signed with url_key, so the crop route can render it on first
+        access (see render_lazy_crop) and refuse boxes nobody planned. Only
+        the image size is needed here.
+
+        Args:
+            upload_name: Filename of the upload inside the upload folder
+            image_size: (width, height) of the upload in pixels
+            sections: List of section objects with bounding_box data
+            token: First 16 hex digits of the upload's content hash
+
+        Returns:
+            Dict mapping section_id to crop path (without extension)
+        """
+        img_width, img_height = image_size
+        crop_paths = {}
+        for section in sections:
+            if 'bounding_box' not in section:
+                continue
+            coords = self.validate_and_adjust_coordinates(section['bounding_box'], img_width, img_height)
+            spec = {'upload': upload_name, 'token': token, 'section': self._safe_id(section['id']),
+                    'x': coords['x_px'], 'y': coords['y_px'], 'width': coords['width_px'], 'height': coords['height_px']}
+            spec['signature'] = self.sign_lazy_crop(spec)
+            crop_paths[section['id']] = self._lazy_crop_base(spec)
+        return crop_paths
+
+    def sign_lazy_crop(self, spec):
+        """HMAC-SHA256 (first 16 hex digits) over a lazy crop's upload, token, section and box."""
+        message = f"{spec['upload']}/{spec['token']}/{spec['section']}_{spec['x']}_{spec['y']}_{spec['width']}_{spec['height']}"
+        return hmac.new(self.url_key, message.encode('utf-8'), hashlib.sha256).hexdigest()[:16]
+
+    def parse_lazy_crop(self, crop_name):
+        """
+        Parse a lazy crop path relative to the crop folder.
+
+        Returns:
+            Dict with upload, token, section, x, y, width, height and signature,
+            or None if crop_name is not a lazy crop path or its signature does
+            not match (a box no analysis planned)
+        """
+        match = LAZY_CROP_PATTERN.match(crop_name)
+        if not match:
+            return None
+        spec = match.groupdict()
+        for key in ('x', 'y', 'width', 'height'):
+            spec[key] = int(spec[key])
+        if not hmac.compare_digest(spec['signature'], self.sign_lazy_crop(spec)):
+            return None
+        return spec
+
+    def _lazy_crop_base(self, spec):
+        crop_name = f"{spec['section']}_{spec['x']}_{spec['y']}_{spec['width']}_{spec['height']}_{spec['signature']}"
+        return os.path.join(self.upload_crop_dir(spec['upload']), spec['token'], crop_name)
+
+    def _find_rendered(self, crop_base):
+        for extension in self.encoding.extensions:
+            if os.path.exists(crop_base + extension):
+                return crop_base + extension
+        return None
+
+    def _write_atomic(self, crop_base, extension, data):
+        os.makedirs(os.path.dirname(crop_base), exist_ok=True)
+        # Concurrent first requests for the same file may race; never expose a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(crop_base), suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            # mkstemp creates 0600; a fronting server (USE_X_SENDFILE) must be able to read crops
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, crop_base + extension)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return crop_base + extension
+
+    def _lazy_level(self, spec, level):
+        # A crop no larger than the level is served at full resolution
+        return level if level and level < max(spec['width'], spec['height']) else None
+
+    def find_rendered_crop(self, spec, level=None):
+        """Path of an already rendered lazy crop (or one of its pyramid levels), or None."""
+        return self._find_rendered(self._level_base(self._lazy_crop_base(spec), self._lazy_level(spec, level)))
+
+    def render_lazy_crop(self, image_path, spec, level=None):
+        """
+        Cut, encode and persist a lazy crop.
+
+        Only the requested pyramid level is encoded. Its pixels are built
+        through the larger levels, so a list preview never encodes the full
+        resolution crop.
+
+        Args:
+            image_path: The upload's path or DecodedImage
+            spec: Parsed lazy crop path from parse_lazy_crop
+            level: Pyramid level from pyramid_level (None for full resolution)
+
+        Returns:
+            Path to the written crop file
+        """
+        image = DecodedImage.load(image_path)
+        region = image.region(spec['x'], spec['y'], spec['width'], spec['height'])
+        if region.size == 0:
+            raise ValueError(f"Crop box outside the image: {spec}")
+        level = self._lazy_level(spec, level)
+        # The format is chosen on the full region so every level of a crop matches
+        extension, data = self.encoding.encode(self._pyramid_pixels(region, level), self.encoding.choose_format(region))
+        return self._write_atomic(self._level_base(self._lazy_crop_base(spec), level), extension, data)
+
+    def _pack_shelves(self, cells):
+        """
+        Shelf-pack preview cells, tallest first, into rows of sprite_atlas_width.
+
+        Args:
+            cells: List of (section_id, width, height)
+
+        Returns:
+            (placements, atlas_width, atlas_height), placements mapping
+            section_id to (x, y)
+        """
+        padding = self.sprite_padding
+        atlas_width = max([self.sprite_atlas_width] + [width for _, width, _ in cells])
+        placements = {}
+        x, y, shelf_height = 0, 0, 0
+        for section_id, width, height in sorted(cells, key=lambda cell: -cell[2]):
+            if x and x + width > atlas_width:
+                x, y, shelf_height = 0, y + shelf_height + padding, 0
+            placements[section_id] = (x, y)
+            x += width + padding
+            shelf_height = max(shelf_height, height)
+        used_width = max((placements[sid][0] + width for sid, width, _ in cells), default=0)
+        return placements, used_width, y + shelf_height
+
+    def plan_sprite_atlas(self, upload_name, image_size, sections, token, image=None):
+        """
+        Lay out a sprite atlas holding a downscaled preview of every section.
+
+        The layout only needs the bounding boxes. It is saved next to the lazy
+        crops and named by its digest; the atlas itself is rendered on first
+        request (see render_sprite_atlas) unless a decoded image is passed.
+
+        Args:
+            upload_name: Filename of the upload inside the upload folder
+            image_size: (width, height) of the upload in pixels
+            sections: List of section objects with bounding_box data
+            token: First 16 hex digits of the upload's content hash
+            image: Optional DecodedImage; when given the atlas is rendered now
+
+        Returns:
+            Dict with path (atlas path without extension), width, height and
+            sprites mapping section_id to its x, y, width, height in the atlas,
+            or None when no section has a bounding box
+        """
+        img_width, img_height = image_size
+        sources, cells = {}, []
+        for section in sections:
+            if 'bounding_box' not in section:
+                continue
+            coords = self.validate_and_adjust_coordinates(section['bounding_box'], img_width, img_height)
+            width, height = coords['width_px'], coords['height_px']
+            scale = min(1.0, self.sprite_max_size / float(max(width, height)))
+            cells.append((section['id'], max(1, int(round(width * scale))), max(1, int(round(height * scale)))))
+            sources[section['id']] = [coords['x_px'], coords['y_px'], width, height]
+        if not cells:
+            return None
+
+        placements, atlas_width, atlas_height = self._pack_shelves(cells)
+        sprites = {
+            section_id: {'x': placements[section_id][0], 'y': placements[section_id][1], 'width': width, 'height': height}
+            for section_id, width, height in cells
+        }
+        layout = {'width': atlas_width, 'height': atlas_height, 'sprites': sprites, 'sources': sources}
+        payload = json.dumps(layout, sort_keys=True).encode('utf-8')
+        spec = {'upload': upload_name, 'token': token, 'digest': hashlib.sha1(payload).hexdigest()[:12]}
+
+        atlas_base = self._sprite_atlas_base(spec)
+        if not os.path.exists(atlas_base + '.json'):
+            self._write_atomic(atlas_base, '.json', payload)
+        if image is not None and self.find_rendered_sprite_atlas(spec) is None:
+            self.render_sprite_atlas(image, spec)
+        return {'path': atlas_base, 'width': atlas_width, 'height': atlas_height, 'sprites': sprites}
+
+    def parse_sprite_atlas(self, crop_name):
+        """
+        Parse a sprite atlas path relative to the crop folder.
+
+        Returns:
+            Dict with upload, token and digest, or None if crop_name is not a
+            sprite atlas path
+        """
+        match = SPRITE_ATLAS_PATTERN.match(crop_name)
+        return match.groupdict() if match else None
+
+    def _sprite_atlas_base(self, spec):
+        return os.path.join(self.upload_crop_dir(spec['upload']), spec['token'], f"atlas_{spec['digest']}")
+
+    def has_sprite_atlas_layout(self, spec):
+        """True if the atlas's layout file (written by plan_sprite_atlas) is on disk."""
+        return os.path.exists(self._sprite_atlas_base(spec) + '.json')
+
+    def find_rendered_sprite_atlas(self, spec):
+        """Path of an already rendered sprite atlas, or None."""
+        return self._find_rendered(self._sprite_atlas_base(spec))
+
+    def render_sprite_atlas(self, image_path, spec):
+        """
+        Downscale every section into its atlas cell, encode and persist the atlas.
+
+        Args:
+            image_path: The upload's path or DecodedImage
+            spec: Parsed sprite atlas path from parse_sprite_atlas
+
+        Returns:
+            Path to the written atlas file
+        """
+        atlas_base = self._sprite_atlas_base(spec)
+        try:
+            with open(atlas_base + '.json', 'r') as f:
+                layout = json.load(f)
+        except (OSError, ValueError):
+            raise ValueError(f"Sprite atlas layout not found: {spec}")
+
+        image = DecodedImage.load(image_path)
+        atlas = np.full((layout['height'], layout['width'], 3), 255, dtype=np.uint8)
+        for section_id, sprite in layout['sprites'].items():
+            region = image.region(*layout['sources'][section_id])
+            if region.size == 0:
+                continue
+            cell_size = (sprite['width'], sprite['height'])
+            if region.shape[1::-1] != cell_size:
+                region = cv2.resize(region, cell_size, interpolation=cv2.INTER_AREA)
+            atlas[sprite['y']:sprite['y'] + sprite['height'], sprite['x']:sprite['x'] + sprite['width']] = region
+        extension, data = self.encoding.encode(atlas)
+        return self._write_atomic(atlas_base, extension, data)
+
     def get_section_image_base64(self, crop_path):
         """
         Convert cropped image to base64 for frontend display
@@ -151,16 +582,24 @@ class ImageCropper:
             print(f"Error encoding image {crop_path}: {str(e)}")
             return None
     
-    def cleanup_crops(self, base_filename):
+    def cleanup_crops(self, upload_name):
         """
-        Clean up cropped images for a specific upload
+        Clean up the eagerly written crops of a specific upload
+        
+        Only the upload's own directory is listed, so the cost does not grow with
+        the number of past uploads. Lazy crops live in per-content-token
+        subdirectories, are never stale and are left to the crop collector.
         
         Args:
-            base_filename: Base filename of the original upload
+            upload_name: Filename of the original upload
         """
+        upload_dir = self.upload_crop_dir(upload_name)
         try:
-            for filename in os.listdir(self.crop_folder):
-                if filename.startswith(base_filename):
-                    os.remove(os.path.join(self.crop_folder, filename))
+            with os.scandir(upload_dir) as it:
+                for entry in it:
+                    if entry.is_file():
+                        os.remove(entry.path)
+        except FileNotFoundError:
+            pass
         except Exception as e:
-            print(f"Error cleaning up crops: {str(e)}") 
\ No newline at end of file
+            print(f"Error cleaning up crops: {str(e)}")
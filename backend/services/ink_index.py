@@ -0,0 +1,164 @@
+import cv2
+import numpy as np
+
+
+def find_runs(mask):
+    """
+    Find runs of True values in a 1-D boolean array.
+
+    Returns:
+        (starts, ends) NumPy arrays; run i covers indices starts[i]..ends[i]-1
+    """
+    padded = np.concatenate(([False], np.asarray(mask, dtype=bool), [False]))
+    edges = np.flatnonzero(np.diff(padded.view(np.int8)))
+    return edges[0::2], edges[1::2]
+
+
+class InkIndex:
+    """
+    Summed-area table over a binary ink mask.
+
+    The table is built once with cv2.integral. Afterwards the ink count of any
+    rectangle is four lookups, and the row or column projection profile of a
+    rectangle costs O(height) or O(width) instead of a pass over its pixels.
+
+    The mask may cover only a window of the page (origin gives the window's
+    top-left corner), so region queries do not need a full-page table.
+    Rectangles are x, y, width, height in page pixels and are clipped to the
+    window; results are returned in page pixels.
+    """
+
+    def __init__(self, mask, origin=(0, 0)):
+        """
+        Args:
+            mask: 2-D NumPy array, nonzero = ink
+            origin: (x, y) of the mask's top-left corner in the page
+        """
+        self.height, self.width = mask.shape[:2]
+        self.origin_x, self.origin_y = int(origin[0]), int(origin[1])
+        ink = (mask > 0).view(np.uint8)
+        # (height + 1) x (width + 1); int32 holds any count up to 2^31 pixels
+        self.table = cv2.integral(ink, sdepth=cv2.CV_32S)
+
+    def _clip(self, x, y, width, height):
+        """Clip a page rectangle to the window; returns window coordinates x0, y0, x1, y1."""
+        x, y = int(x) - self.origin_x, int(y) - self.origin_y
+        x0 = min(max(0, x), self.width)
+        y0 = min(max(0, y), self.height)
+        x1 = min(max(x0, x + int(width)), self.width)
+        y1 = min(max(y0, y + int(height)), self.height)
+        return x0, y0, x1, y1
+
+    def _count(self, x0, y0, x1, y1):
+        t = self.table
+        return int(t[y1, x1] - t[y0, x1] - t[y1, x0] + t[y0, x0])
+
+    def _rows(self, x0, y0, x1, y1):
+        column_sums = self.table[y0:y1 + 1, x1] - self.table[y0:y1 + 1, x0]
+        return np.diff(column_sums)
+
+    def _cols(self, x0, y0, x1, y1):
+        row_sums = self.table[y1, x0:x1 + 1] - self.table[y0, x0:x1 + 1]
+        return np.diff(row_sums)
+
+    def count(self, x, y, width, height):
+        """Number of ink pixels inside a rectangle."""
+        return self._count(*self._clip(x, y, width, height))
+
+    def density(self, x, y, width, height):
+        """Fraction of ink pixels inside a rectangle (0.0 for an empty rectangle)."""
+        x0, y0, x1, y1 = self._clip(x, y, width, height)
+        area = (x1 - x0) * (y1 - y0)
+        return self._count(x0, y0, x1, y1) / area if area else 0.0
+
+    def is_empty(self, x, y, width, height, max_density=0.0):
+        """True when a rectangle holds at most max_density ink."""
+        return self.density(x, y, width, height) <= max_density
+
+    def row_profile(self, x, y, width, height):
+        """Ink count of every row of a rectangle (length = clipped height)."""
+        return self._rows(*self._clip(x, y, width, height))
+
+    def col_profile(self, x, y, width, height):
+        """Ink count of every column of a rectangle (length = clipped width)."""
+        return self._cols(*self._clip(x, y, width, height))
+
+    def gaps(self, x, y, width, height, axis=0, min_gap=1, max_density=0.0):
+        """
+        Find whitespace runs across a rectangle.
+
+        Args:
+            x, y, width, height: Rectangle to search
+            axis: 0 for horizontal gaps (runs of empty rows), 1 for vertical gaps
+                  (runs of empty columns)
+            min_gap: Minimum run length in pixels
+            max_density: A row/column counts as empty when at most this fraction of it is ink
+
+        Returns:
+            List of (start, end) pixel coordinates (y for axis 0, x for axis 1)
+        """
+        x0, y0, x1, y1 = self._clip(x, y, width, height)
+        if axis == 0:
+            profile, span, offset = self._rows(x0, y0, x1, y1), x1 - x0, y0 + self.origin_y
+        else:
+            profile, span, offset = self._cols(x0, y0, x1, y1), y1 - y0, x0 + self.origin_x
+        starts, ends = find_runs(profile <= max_density * span)
+        keep = (ends - starts) >= min_gap
+        return [(int(s) + offset, int(e) + offset) for s, e in zip(starts[keep], ends[keep])]
+
+    def _trim(self, x0, y0, x1, y1, max_density=0.0):
+        rows = np.flatnonzero(self._rows(x0, y0, x1, y1) > max_density * (x1 - x0))
+        cols = np.flatnonzero(self._cols(x0, y0, x1, y1) > max_density * (y1 - y0))
+        if rows.size == 0 or cols.size == 0:
+            return None
+        return {
+            'x': self.origin_x + x0 + int(cols[0]),
+            'y': self.origin_y + y0 + int(rows[0]),
+            'width': int(cols[-1] - cols[0]) + 1,
+            'height': int(rows[-1] - rows[0]) + 1
+        }
+
+    def trim(self, x, y, width, height, max_density=0.0):
+        """
+        Shrink a rectangle to the bounding box of its ink.
+
+        Returns:
+            Dict with x, y, width, height, or None when the rectangle holds no ink
+        """
+        return self._trim(*self._clip(x, y, width, height), max_density=max_density)
+
+    def grow(self, x, y, width, height, max_gap_x=40, max_gap_y=30):
+        """
+        Grow a rectangle over neighbouring ink.
+
+        Each side repeatedly moves out to the farthest ink found within max_gap
+        pixels beyond it (checked across the current extent of the box), until
+        no side moves or it reaches the window edge. The result is trimmed to
+        its ink, so a loose manual box snaps to the content block it overlaps.
+
+        Returns:
+            Dict with x, y, width, height, or None when the grown box holds no ink
+        """
+        x0, y0, x1, y1 = self._clip(x, y, width, height)
+        changed = True
+        while changed:
+            changed = False
+            # Left / right: columns with ink in the band beside the box
+            start = max(0, x0 - max_gap_x)
+            cols = np.flatnonzero(self._cols(start, y0, x0, y1))
+            if cols.size:
+                x0, changed = start + int(cols[0]), True
+            end = min(self.width, x1 + max_gap_x)
+            cols = np.flatnonzero(self._cols(x1, y0, end, y1))
+            if cols.size:
+                x1, changed = x1 + int(cols[-1]) + 1, True
+            # Top / bottom: rows with ink in the band above and below the box
+            start = max(0, y0 - max_gap_y)
+            rows = np.flatnonzero(self._rows(x0, start, x1, y0))
+            if rows.size:
+                y0, changed = start + int(rows[0]), True
+            end = min(self.height, y1 + max_gap_y)
+            rows = np.flatnonzero(self._rows(x0, y1, x1, end))
+            if rows.size:
+                y1, changed = y1 + int(rows[-1]) + 1, True
+        return self._trim(x0, y0, x1, y1)
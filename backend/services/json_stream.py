@@ -0,0 +1,107 @@
+import json
+
+
+class JSONArrayStreamDecoder:
+    """
+    Incrementally decodes the elements of a top-level JSON array.
+
+    Text is fed in arbitrary chunks (e.g. from a streaming model response).
+    Every element is returned as soon as its closing character arrives, so a
+    truncated stream still yields every complete element. Any text before the
+    opening '[' (such as a markdown code fence) is ignored.
+    """
+
+    def __init__(self):
+        self._buffer = ''
+        self._pos = 0
+        self._started = False
+        self.done = False
+        self._element_start = None
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, text):
+        """
+        Add a chunk of text.
+
+        Returns:
+            List of elements completed by this chunk (possibly empty)
+        """
+        if self.done or not text:
+            return []
+        self._buffer += text
+        elements = []
+
+        buffer = self._buffer
+        pos = self._pos
+        while pos < len(buffer):
+            char = buffer[pos]
+
+            if not self._started:
+                if char == '[':
+                    self._started = True
+                pos += 1
+                continue
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    if self._depth == 0:
+                        # A bare string element ends with its closing quote
+                        elements.extend(self._emit(buffer, pos + 1))
+                pos += 1
+                continue
+
+            if self._element_start is None:
+                # Between elements: skip separators until the next element or the end
+                if char == ']':
+                    self.done = True
+                    pos += 1
+                    break
+                if char in ', \t\r\n':
+                    pos += 1
+                    continue
+                self._element_start = pos
+
+            if char == '"':
+                self._in_string = True
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                if self._depth == 0:
+                    # A scalar element terminated by the closing bracket of the array
+                    elements.extend(self._emit(buffer, pos))
+                    self.done = True
+                    pos += 1
+                    break
+                self._depth -= 1
+                if self._depth == 0:
+                    elements.extend(self._emit(buffer, pos + 1))
+            elif char == ',' and self._depth == 0:
+                # A scalar element (number, true, false, null) terminated by a comma
+                elements.extend(self._emit(buffer, pos))
+            pos += 1
+
+        # Drop consumed text so the buffer only holds the element in progress
+        keep_from = self._element_start if self._element_start is not None else pos
+        self._buffer = buffer[keep_from:]
+        self._pos = pos - keep_from
+        if self._element_start is not None:
+            self._element_start = 0
+        return elements
+
+    def _emit(self, buffer, end):
+        raw = buffer[self._element_start:end].strip()
+        self._element_start = None
+        if not raw:
+            return []
+        try:
+            return [json.loads(raw)]
+        except json.JSONDecodeError as e:
+            print(f"⚠️ Skipping malformed streamed JSON element ({e})")
+            return []
@@ -1,57 +1,346 @@
+import os
+import heapq
 import cv2
 import numpy as np
 from PIL import Image
+from services.decoded_image import DecodedImage, iter_gray_strips
+from services.ink_index import InkIndex, find_runs
+
 
 class LayoutSegmenter:
     def __init__(self):
-        pass
+        # Rows per strip for streaming segmentation of very tall pages
+        self.stream_strip_height = int(os.getenv('LAYOUT_STREAM_STRIP_HEIGHT', 1024))
+        # detect_visual_blocks can run on a downscaled copy (e.g. 0.5 for retina
+        # screenshots) and optionally snap the boxes back at full resolution
+        self.detect_scale = float(os.getenv('LAYOUT_DETECT_SCALE', 1.0))
+        self.detect_refine = os.getenv('LAYOUT_DETECT_REFINE', '1') != '0'
+        # Detected blocks overlapping by at least this IoU, or with at least this
+        # fraction of the smaller box inside the other, are merged into one block
+        self.merge_iou = float(os.getenv('LAYOUT_MERGE_IOU', 0.5))
+        self.merge_containment = float(os.getenv('LAYOUT_MERGE_CONTAINMENT', 0.9))
+        # Block detection used by the analysis pipeline: 'contours' (detect_visual_blocks),
+        # 'xy-cut' (recursive whitespace cuts, keeps multi-column grids apart) or
+        # 'stream' (full-width sections from iter_horizontal_sections; reading the
+        # file with pyvips, its pixel memory does not grow with page height)
+        self.layout_mode = os.getenv('LAYOUT_MODE', 'contours').lower()
+        if self.layout_mode not in ('contours', 'xy-cut', 'stream'):
+            print(f"⚠️  Unknown LAYOUT_MODE '{self.layout_mode}', using contours")
+            self.layout_mode = 'contours'
+
+    def _whitespace_mask(self, gray):
+        """Binary mask (255 = ink) used for whitespace and projection analysis."""
+        # Blur to reduce noise
+        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
+        # Adaptive threshold to highlight whitespace
+        return cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+                                     cv2.THRESH_BINARY_INV, 15, 10)
+
+    # Rows/columns of context the whitespace mask needs around a window (5x5 blur
+    # plus the 15x15 adaptive threshold) to match the full-page mask exactly
+    MASK_HALO = 16
+
+    def ink_index(self, image_path, region=None, margin=0):
+        """
+        Summed-area table of the whitespace mask of a page or a window of it.
+
+        The index is built per call and not memoized on the decode: a full-page
+        table is 4 bytes per pixel (about 86 MB for a 1440x15000 capture) and
+        would live as long as the cached decode. Region queries only threshold
+        and index a window around the region.
+
+        Args:
+            image_path: Image path or DecodedImage
+            region: Dict with x, y, width, height in pixels (default: whole image)
+            margin: Pixels of page around the region included in the window
+
+        Returns:
+            InkIndex in page coordinates
+        """
+        image = DecodedImage.load(image_path)
+        if region is None:
+            return InkIndex(self._whitespace_mask(image.gray))
+
+        x0 = max(0, int(region['x']) - margin)
+        y0 = max(0, int(region['y']) - margin)
+        x1 = min(image.width, int(region['x'] + region['width']) + margin)
+        y1 = min(image.height, int(region['y'] + region['height']) + margin)
+        # Threshold the window plus a halo, then keep the window
+        hx0, hy0 = max(0, x0 - self.MASK_HALO), max(0, y0 - self.MASK_HALO)
+        hx1, hy1 = min(image.width, x1 + self.MASK_HALO), min(image.height, y1 + self.MASK_HALO)
+        gray = cv2.cvtColor(image.region(hx0, hy0, hx1 - hx0, hy1 - hy0), cv2.COLOR_BGR2GRAY)
+        mask = self._whitespace_mask(gray)[y0 - hy0:y1 - hy0, x0 - hx0:x1 - hx0]
+        return InkIndex(mask, origin=(x0, y0))
+
+    def find_gaps(self, image_path, region=None, axis=0, min_gap=40, max_density=0.002):
+        """
+        Whitespace runs across a region of the page.
 
-    def find_horizontal_sections(self, image_path, min_gap_height=40, debug=False):
+        Args:
+            image_path: Image path or DecodedImage
+            region: Dict with x, y, width, height in pixels (default: whole image)
+            axis: 0 for horizontal gaps (empty rows), 1 for vertical gaps (empty columns)
+            min_gap: Minimum gap size in pixels
+            max_density: A row/column counts as empty when at most this fraction of it is ink
+
+        Returns:
+            List of (start, end) pixel coordinates
+        """
+        index = self.ink_index(image_path, region)
+        x, y, w, h = self._region_box(index, region)
+        return index.gaps(x, y, w, h, axis=axis, min_gap=min_gap, max_density=max_density)
+
+    def grow_block(self, image_path, region, max_gap_x=40, max_gap_y=30, search_margin=512):
+        """
+        Snap a box to the content block it covers.
+
+        The box is first trimmed to the ink inside it (dropping loose margins),
+        then grown over ink within max_gap_x / max_gap_y of its sides. Only a
+        window of search_margin pixels around the box is indexed; when the
+        block reaches the window's edge the margin is doubled and the box grown
+        again, so the result matches a full-page search.
+
+        Returns:
+            Dict with x, y, width, height in pixels, or None if the box holds no ink
+        """
+        image = DecodedImage.load(image_path)
+        margin = search_margin
+        while True:
+            index = self.ink_index(image, region, margin=margin)
+            box = index.trim(*self._region_box(index, region))
+            if box is None:
+                return None
+            grown = index.grow(box['x'], box['y'], box['width'], box['height'],
+                               max_gap_x=max_gap_x, max_gap_y=max_gap_y)
+            if not self._near_window_edge(index, grown, image, max_gap_x, max_gap_y):
+                return grown
+            margin *= 2
+
+    def _near_window_edge(self, index, box, image, gap_x, gap_y):
+        """True when ink beyond an index window edge (that is not an image edge) could still join a box."""
+        right, bottom = index.origin_x + index.width, index.origin_y + index.height
+        return ((box['x'] - gap_x < index.origin_x and index.origin_x > 0)
+                or (box['y'] - gap_y < index.origin_y and index.origin_y > 0)
+                or (box['x'] + box['width'] + gap_x > right and right < image.width)
+                or (box['y'] + box['height'] + gap_y > bottom and bottom < image.height))
+
+    def is_empty(self, image_path, region, max_density=0.002):
+        """True when a region holds (almost) no ink, e.g. a manual crop of pure background."""
+        index = self.ink_index(image_path, region)
+        return index.is_empty(*self._region_box(index, region), max_density=max_density)
+
+    def _region_box(self, index, region):
+        if region is None:
+            return 0, 0, index.width, index.height
+        return region['x'], region['y'], region['width'], region['height']
+
+    def find_horizontal_sections(self, image_path, min_gap_height=40, debug=False, peak_ratio=0.15):
         """
         Detect large horizontal whitespace gaps (section dividers) in a webpage screenshot.
+        Accepts an image path or a DecodedImage. A row is whitespace when its ink is
+        below peak_ratio of the most inked row.
         Returns a list of y-coordinates (start, end) for each detected section.
         """
-        # Load image
-        img = cv2.imread(image_path)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        # Blur to reduce noise
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-        # Adaptive threshold to highlight whitespace
-        thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
-                                       cv2.THRESH_BINARY_INV, 15, 10)
-        # Sum pixels horizontally
-        horizontal_projection = np.sum(thresh, axis=1)
-        # Normalize
-        norm_proj = horizontal_projection / np.max(horizontal_projection)
+        # Load image (reuses the shared decode when given a DecodedImage)
+        image = DecodedImage.load(image_path)
+        img = image.pixels
+        # Sum ink pixels horizontally (row profile of the whitespace mask)
+        horizontal_projection = np.count_nonzero(self._whitespace_mask(image.gray), axis=1)
+        section_ranges = self._sections_from_profile(horizontal_projection, min_gap_height, peak_ratio)
+        if debug:
+            self.visualize_boundaries(img, section_ranges)
+        return section_ranges
+
+    def _sections_from_profile(self, horizontal_projection, min_gap_height, peak_ratio):
+        """Split a page's row ink profile at whitespace runs longer than min_gap_height."""
+        peak = horizontal_projection.max() if len(horizontal_projection) else 0
         # Find long runs of low values (whitespace)
-        whitespace = norm_proj < 0.15  # 0.0 = pure white, 1.0 = pure black
-        # Find contiguous whitespace regions
-        sections = []
-        in_gap = False
-        gap_start = 0
-        for y, is_white in enumerate(whitespace):
-            if is_white and not in_gap:
-                in_gap = True
-                gap_start = y
-            elif not is_white and in_gap:
-                in_gap = False
-                gap_end = y
-                if gap_end - gap_start > min_gap_height:
-                    sections.append((gap_start, gap_end))
-        # Add last gap if image ends in whitespace
-        if in_gap and (len(whitespace) - gap_start > min_gap_height):
-            sections.append((gap_start, len(whitespace)))
+        if peak > 0:
+            whitespace = horizontal_projection < peak_ratio * peak  # 0.0 = pure white, 1.0 = pure black
+        else:
+            whitespace = np.zeros(len(horizontal_projection), dtype=bool)
+        # Find contiguous whitespace regions longer than the minimum gap
+        gap_starts, gap_ends = find_runs(whitespace)
+        keep = (gap_ends - gap_starts) > min_gap_height
+        sections = list(zip(gap_starts[keep].tolist(), gap_ends[keep].tolist()))
         # Now, use these gaps to define section boundaries
         boundaries = [0]
         for start, end in sections:
             boundaries.append(end)
-        if boundaries[-1] != img.shape[0]:
-            boundaries.append(img.shape[0])
+        if boundaries[-1] != len(horizontal_projection):
+            boundaries.append(len(horizontal_projection))
         # Return as list of (start_y, end_y) tuples
-        section_ranges = [(boundaries[i], boundaries[i+1]) for i in range(len(boundaries)-1)]
-        if debug:
-            self.visualize_boundaries(img, section_ranges)
-        return section_ranges
+        return [(boundaries[i], boundaries[i+1]) for i in range(len(boundaries)-1)]
+
+    def iter_horizontal_sections(self, image_path, min_gap_height=40, peak_ratio=0.15, strip_height=None):
+        """
+        Streaming variant of find_horizontal_sections for extremely tall pages.
+
+        The image is read in horizontal strips (see iter_gray_strips) and the
+        whitespace mask is computed per strip with a small halo of neighbouring
+        rows, so the row profile matches the whole-image mask exactly. Only the
+        profile (one integer per row) is kept; the sections are then split with
+        the same peak-relative threshold as find_horizontal_sections, so both
+        return identical sections. The page's peak row is only known once every
+        strip has been read, so sections are yielded after the last strip.
+
+        Pixel memory is bounded by the strip height only when the strips are
+        read from a file with pyvips. Given a DecodedImage (as analyze_page is,
+        from the app's shared decode) the full page is already in memory and
+        only the mask work is done per strip.
+
+        Args:
+            image_path: Image path or DecodedImage
+            min_gap_height: Gaps must be longer than this (px) to split sections
+            peak_ratio: A row is whitespace below this fraction of the most inked row
+            strip_height: Rows decoded per strip (default: LAYOUT_STREAM_STRIP_HEIGHT)
+
+        Yields:
+            (start_y, end_y) tuples, top to bottom
+        """
+        # Rows of context needed by the 5x5 blur plus the 15x15 adaptive threshold
+        halo = 16
+        strip_height = max(strip_height or self.stream_strip_height, 2 * halo)
+        profile = []        # Row ink counts, one array per strip
+        carry = None        # Context rows plus rows awaiting their lower halo
+        carry_y = 0         # Page row of carry[0]
+        done_until = 0      # Rows whose profile has been computed
+
+        strips = iter_gray_strips(image_path, strip_height)
+        strip = next(strips, None)
+        while strip is not None:
+            following = next(strips, None)
+            buffer = strip if carry is None else np.vstack((carry, strip))
+            end = carry_y + buffer.shape[0] if following is None else carry_y + buffer.shape[0] - halo
+
+            mask = self._whitespace_mask(buffer)
+            rows = mask[done_until - carry_y:end - carry_y]
+            profile.append(cv2.reduce((rows > 0).view(np.uint8), 1, cv2.REDUCE_SUM, dtype=cv2.CV_32S).ravel())
+
+            done_until = end
+            keep_from = max(carry_y, done_until - halo)
+            carry = buffer[keep_from - carry_y:]
+            carry_y = keep_from
+            strip = following
+
+        horizontal_projection = np.concatenate(profile) if profile else np.zeros(0, dtype=np.int32)
+        yield from self._sections_from_profile(horizontal_projection, min_gap_height, peak_ratio)
+
+    def detect_blocks(self, image_path):
+        """
+        Detect the page's content blocks with the configured layout_mode.
+
+        Args:
+            image_path: Image path or DecodedImage
+
+        Returns:
+            List of blocks {x, y, width, height} in pixels
+        """
+        if self.layout_mode == 'xy-cut':
+            blocks = self.xy_cut(image_path)['blocks']
+            print(f"✅ XY-cut found {len(blocks)} blocks")
+            return blocks
+        if self.layout_mode == 'stream':
+            if isinstance(image_path, DecodedImage):
+                width = image_path.width
+                # Stream from the file when there is one, so no full-page grayscale plane is built
+                source = image_path.path if image_path.path and os.path.isfile(image_path.path) else image_path
+            else:
+                with Image.open(image_path) as opened:
+                    width = opened.width
+                source = image_path
+            blocks = [{'x': 0, 'y': int(start), 'width': width, 'height': int(end - start)}
+                      for start, end in self.iter_horizontal_sections(source)]
+            print(f"✅ Streaming segmentation found {len(blocks)} sections")
+            return blocks
+        return self.detect_visual_blocks(image_path)
+
+    def xy_cut(self, image_path, min_block_size=24, min_row_gap=30, min_col_gap=40, noise_ratio=0.002):
+        """
+        Recursive XY-cut segmentation.
+
+        Each node is trimmed to its ink bounding box, then split at every
+        whitespace run in its row (horizontal cut) or column (vertical cut)
+        projection profile. Directions alternate between levels, falling back to
+        the other direction when the preferred one has no gap, until a node has
+        no gap left or is smaller than twice min_block_size. Projection profiles
+        are read from the image's summed-area table in O(height + width) per
+        node, so deep trees never rescan pixels.
+
+        Args:
+            image_path: Image path or DecodedImage
+            min_block_size: Nodes smaller than twice this (in both directions) are leaves
+            min_row_gap: Minimum whitespace height (px) for a horizontal cut
+            min_col_gap: Minimum whitespace width (px) for a vertical cut
+            noise_ratio: A row/column counts as empty when at most this fraction of it is ink
+
+        Returns:
+            Dict with:
+                tree: Root node {x, y, width, height, split, children} (split is
+                      'horizontal', 'vertical' or None for leaves), or None for a blank page
+                blocks: Flat list of leaf boxes {x, y, width, height} in reading order
+        """
+        image = DecodedImage.load(image_path)
+        # Projection profiles of each node come from the summed-area table
+        index = self.ink_index(image)
+
+        blocks = []
+        tree = self._xy_cut_node(index, 0, 0, image.width, image.height, 'horizontal',
+                                 min_block_size, min_row_gap, min_col_gap, noise_ratio, blocks)
+        return {'tree': tree, 'blocks': blocks}
+
+    def _xy_cut_node(self, index, x, y, width, height, prefer, min_block_size,
+                     min_row_gap, min_col_gap, noise_ratio, blocks):
+        rows = index.row_profile(x, y, width, height)
+        cols = index.col_profile(x, y, width, height)
+        filled_rows = np.flatnonzero(rows > noise_ratio * width)
+        filled_cols = np.flatnonzero(cols > noise_ratio * height)
+        if filled_rows.size == 0 or filled_cols.size == 0:
+            return None
+
+        # Trim to the ink bounding box; trimming empty columns leaves row sums unchanged
+        top, bottom = filled_rows[0], filled_rows[-1] + 1
+        left, right = filled_cols[0], filled_cols[-1] + 1
+        rows = rows[top:bottom]
+        cols = cols[left:right]
+        x, y = x + int(left), y + int(top)
+        width, height = int(right - left), int(bottom - top)
+        node = {'x': x, 'y': y, 'width': width, 'height': height, 'split': None, 'children': []}
+
+        if width >= 2 * min_block_size or height >= 2 * min_block_size:
+            order = ['horizontal', 'vertical'] if prefer == 'horizontal' else ['vertical', 'horizontal']
+            for direction in order:
+                if direction == 'horizontal':
+                    segments = self._profile_segments(rows, noise_ratio * width, min_row_gap)
+                else:
+                    segments = self._profile_segments(cols, noise_ratio * height, min_col_gap)
+                if len(segments) < 2:
+                    continue
+
+                node['split'] = direction
+                next_prefer = 'vertical' if direction == 'horizontal' else 'horizontal'
+                for start, end in segments:
+                    if direction == 'horizontal':
+                        child = self._xy_cut_node(index, x, y + start, width, end - start, next_prefer,
+                                                  min_block_size, min_row_gap, min_col_gap, noise_ratio, blocks)
+                    else:
+                        child = self._xy_cut_node(index, x + start, y, end - start, height, next_prefer,
+                                                  min_block_size, min_row_gap, min_col_gap, noise_ratio, blocks)
+                    if child is not None:
+                        node['children'].append(child)
+                return node
+
+        blocks.append({'x': x, 'y': y, 'width': width, 'height': height})
+        return node
+
+    def _profile_segments(self, profile, threshold, min_gap):
+        """Split a trimmed projection profile at whitespace runs of at least min_gap."""
+        gap_starts, gap_ends = find_runs(profile <= threshold)
+        keep = (gap_ends - gap_starts) >= min_gap
+        gap_starts, gap_ends = gap_starts[keep], gap_ends[keep]
+        seg_starts = np.concatenate(([0], gap_ends))
+        seg_ends = np.concatenate((gap_starts, [len(profile)]))
+        return [(int(s), int(e)) for s, e in zip(seg_starts, seg_ends) if e > s]
 
     def visualize_boundaries(self, img, section_ranges, out_path='debug_sections.png'):
         vis = img.copy()
@@ -60,45 +349,187 @@ class LayoutSegmenter:
         cv2.imwrite(out_path, vis)
         print(f"Saved debug visualization to {out_path}") 
 
-    def detect_visual_blocks(self, image_path, min_contour_area=0.001):
+    def _odd(self, value, minimum=3):
+        value = max(minimum, int(round(value)))
+        return value if value % 2 else value + 1
+
+    def _block_threshold(self, gray, scale=1.0):
+        """Thresholded text mask for block detection; kernel sizes follow the image scale."""
+        # Invert the image because we are looking for dark text on light backgrounds
+        # and contours are found on white objects.
+        gray = 255 - gray
+
+        # Apply blur to reduce noise and small details
+        blur_size = 5 if scale == 1.0 else self._odd(5 * scale)
+        blurred = cv2.GaussianBlur(gray, (blur_size, blur_size), 0)
+
+        # Use adaptive thresholding to handle different lighting conditions
+        block_size = 11 if scale == 1.0 else self._odd(11 * scale)
+        return cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
+                                     cv2.THRESH_BINARY_INV, block_size, 4)
+
+    def _refine_block(self, gray, block, scale):
+        """
+        Snap a block detected on a downscaled image to full-resolution ink.
+
+        Only a thin band around each edge is thresholded at full resolution.
+        Each edge moves to the outermost ink found in its band plus the reach of
+        the full-resolution dilation, which is where the full-res path puts it.
+        Edges without ink in their band keep the coarse position.
+        """
+        img_height, img_width = gray.shape[:2]
+        margin = int(np.ceil(3 / scale))
+        # Three iterations of the centered 20x5 kernel reach 30px sideways and 6px vertically
+        reach_x, reach_y = 30, 6
+        x0, y0 = block['x'], block['y']
+        x1, y1 = x0 + block['width'], y0 + block['height']
+
+        def band_ink(bx0, by0, bx1, by1, axis):
+            bx0, by0 = max(0, bx0), max(0, by0)
+            bx1, by1 = min(img_width, bx1), min(img_height, by1)
+            if bx1 <= bx0 or by1 <= by0:
+                return bx0 if axis == 0 else by0, np.empty(0, dtype=np.intp)
+            ink = self._block_threshold(gray[by0:by1, bx0:bx1])
+            profile = cv2.reduce(ink, axis, cv2.REDUCE_MAX).ravel()
+            return (bx0 if axis == 0 else by0), np.flatnonzero(profile)
+
+        band_x = margin + reach_x
+        band_y = margin + reach_y
+        offset, cols = band_ink(x0 - margin, y0, x0 + band_x + margin, y1, 0)
+        left = offset + cols[0] - reach_x if cols.size else x0
+        offset, cols = band_ink(x1 - band_x - margin, y0, x1 + margin, y1, 0)
+        right = offset + cols[-1] + 1 + reach_x if cols.size else x1
+        offset, rows = band_ink(x0, y0 - margin, x1, y0 + band_y + margin, 1)
+        top = offset + rows[0] - reach_y if rows.size else y0
+        offset, rows = band_ink(x0, y1 - band_y - margin, x1, y1 + margin, 1)
+        bottom = offset + rows[-1] + 1 + reach_y if rows.size else y1
+
+        left, top = max(0, int(left)), max(0, int(top))
+        right, bottom = min(img_width, int(right)), min(img_height, int(bottom))
+        if right <= left or bottom <= top:
+            return block
+        return {'x': left, 'y': top, 'width': right - left, 'height': bottom - top}
+
+    def merge_overlapping_blocks(self, blocks, iou_threshold=None, containment_threshold=None):
+        """
+        Merge near-duplicate and contained blocks.
+
+        Candidate pairs come from a sweep down the page over the boxes sorted by
+        top edge: a heap of bottom edges retires boxes that end above the
+        current one, so a box is only compared with the boxes crossing its top
+        row. Pages stack blocks vertically and a row holds only a few columns,
+        so this is O(n log n + n * w) for at most w blocks side by side. Pairs
+        above either threshold are joined with union-find and every group is
+        replaced by its bounding box. The sweep repeats until no group changes,
+        since merged boxes can overlap again.
+
+        Args:
+            blocks: List of dicts with x, y, width, height (pixels)
+            iou_threshold: Merge pairs with at least this IoU (default: self.merge_iou)
+            containment_threshold: Merge pairs where at least this fraction of the
+                                   smaller box lies inside the larger one
+                                   (default: self.merge_containment)
+
+        Returns:
+            List of merged blocks, sorted by their top-y coordinate
+        """
+        iou_threshold = self.merge_iou if iou_threshold is None else iou_threshold
+        containment_threshold = self.merge_containment if containment_threshold is None else containment_threshold
+        boxes = [(b['x'], b['y'], b['x'] + b['width'], b['y'] + b['height']) for b in blocks]
+
+        while True:
+            parent = list(range(len(boxes)))
+
+            def find(i):
+                while parent[i] != i:
+                    parent[i] = parent[parent[i]]
+                    i = parent[i]
+                return i
+
+            order = sorted(range(len(boxes)), key=lambda i: boxes[i][1])
+            active = []  # Heap of (bottom edge, index)
+            merged_any = False
+            for i in order:
+                x0, y0, x1, y1 = boxes[i]
+                while active and active[0][0] <= y0:
+                    heapq.heappop(active)
+                for _, j in active:
+                    ax0, ay0, ax1, ay1 = boxes[j]
+                    ix = min(x1, ax1) - max(x0, ax0)
+                    if ix <= 0:
+                        continue
+                    inter = ix * (min(y1, ay1) - max(y0, ay0))
+                    area_i = (x1 - x0) * (y1 - y0)
+                    area_j = (ax1 - ax0) * (ay1 - ay0)
+                    if (inter >= iou_threshold * (area_i + area_j - inter)
+                            or inter >= containment_threshold * min(area_i, area_j)):
+                        root_i, root_j = find(i), find(j)
+                        if root_i != root_j:
+                            parent[root_i] = root_j
+                            merged_any = True
+                heapq.heappush(active, (y1, i))
+
+            if not merged_any:
+                break
+            groups = {}
+            for i, box in enumerate(boxes):
+                root = find(i)
+                g = groups.get(root)
+                groups[root] = box if g is None else (min(g[0], box[0]), min(g[1], box[1]),
+                                                      max(g[2], box[2]), max(g[3], box[3]))
+            boxes = list(groups.values())
+
+        merged = [{'x': x0, 'y': y0, 'width': x1 - x0, 'height': y1 - y0} for x0, y0, x1, y1 in boxes]
+        merged.sort(key=lambda block: block['y'])
+        return merged
+
+    def detect_visual_blocks(self, image_path, min_contour_area=0.001, scale=None, refine=None,
+                             max_contour_area=0.95):
         """
         Detects major visual blocks in an image using contour detection.
 
         Args:
-            image_path (str): The path to the image file.
+            image_path (str | DecodedImage): The path to the image file, or the
+                                             already decoded image.
             min_contour_area (float): The minimum area of a contour to be considered a block,
                                       as a fraction of the total image area.
+            scale (float): Detect on a copy downscaled by this factor (kernel sizes scaled
+                           to match) and map boxes back to full resolution. Defaults to
+                           self.detect_scale; 1.0 runs at full resolution.
+            refine (bool): When downscaled, snap box edges to full-resolution ink.
+                           Defaults to self.detect_refine.
+            max_contour_area (float): Contours covering more than this fraction of the
+                                      image (e.g. the page background) are dropped.
 
         Returns:
             list: A list of dictionaries, where each dictionary represents a detected
                   block with its bounding box coordinates (x, y, width, height).
         """
+        scale = self.detect_scale if scale is None else scale
+        refine = self.detect_refine if refine is None else refine
         try:
-            image = cv2.imread(image_path)
-            if image is None:
+            try:
+                image = DecodedImage.load(image_path)
+            except ValueError:
                 print(f"❌ Error: Could not read image at {image_path}")
                 return []
 
-            img_height, img_width, _ = image.shape
-            total_area = img_width * img_height
+            img_width, img_height = image.size
 
-            # 1. Preprocessing for layout detection
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            # Invert the image because we are looking for dark text on light backgrounds
-            # and contours are found on white objects.
-            gray = 255 - gray
-            
-            # Apply blur to reduce noise and small details
-            blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-
-            # Use adaptive thresholding to handle different lighting conditions
-            thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_MEAN_C,
-                                           cv2.THRESH_BINARY_INV, 11, 4)
+            # 1. Preprocessing for layout detection (optionally on a downscaled copy)
+            gray = image.gray
+            if scale < 1.0:
+                gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            else:
+                scale = 1.0
+            total_area = gray.shape[0] * gray.shape[1]
+            thresh = self._block_threshold(gray, scale)
 
             # 2. Dilate to merge text into blocks
             # Use larger kernels to connect separated parts of a section, like columns
             # in a footer.
-            rect_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (20, 5))
+            kernel_size = (max(1, int(round(20 * scale))), max(1, int(round(5 * scale))))
+            rect_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, kernel_size)
             dilated = cv2.dilate(thresh, rect_kernel, iterations=3)
 
             # 3. Find contours
@@ -109,15 +540,31 @@ class LayoutSegmenter:
             for contour in contours:
                 x, y, w, h = cv2.boundingRect(contour)
                 # Filter out very small or very large (full-image) contours
-                if cv2.contourArea(contour) > total_area * min_contour_area and cv2.contourArea(contour) < total_area * 0.95:
+                if cv2.contourArea(contour) > total_area * min_contour_area and cv2.contourArea(contour) < total_area * max_contour_area:
                     detected_blocks.append({'x': x, 'y': y, 'width': w, 'height': h})
-            
-            # Sort blocks by their top-y coordinate
-            detected_blocks.sort(key=lambda block: block['y'])
+
+            # 5. Map boxes from the downscaled copy back to full resolution
+            if scale != 1.0:
+                mapped = []
+                for block in detected_blocks:
+                    x0 = int(np.floor(block['x'] / scale))
+                    y0 = int(np.floor(block['y'] / scale))
+                    x1 = min(img_width, int(np.ceil((block['x'] + block['width']) / scale)))
+                    y1 = min(img_height, int(np.ceil((block['y'] + block['height']) / scale)))
+                    mapped.append({'x': x0, 'y': y0, 'width': x1 - x0, 'height': y1 - y0})
+                detected_blocks = mapped
+                if refine:
+                    detected_blocks = [self._refine_block(image.gray, block, scale) for block in detected_blocks]
+
+            # 6. Collapse duplicates and contained boxes (also sorts by top-y coordinate)
+            raw_count = len(detected_blocks)
+            detected_blocks = self.merge_overlapping_blocks(detected_blocks)
+            if raw_count != len(detected_blocks):
+                print(f"🔄 Merged {raw_count - len(detected_blocks)} overlapping or contained blocks")
 
             print(f"✅ LayoutSegmenter detected {len(detected_blocks)} visual blocks.")
             return detected_blocks
 
         except Exception as e:
             print(f"❌ Error in LayoutSegmenter: {e}")
-            return [] 
\ No newline at end of file
+            return []
@@ -0,0 +1,153 @@
+import os
+import queue
+import threading
+import numpy as np
+import pytesseract
+from PIL import Image
+
+
+class PytesseractBackend:
+    """
+    OCR through pytesseract, which runs the tesseract binary once per call.
+    """
+    name = 'pytesseract'
+
+    def is_available(self):
+        try:
+            pytesseract.get_tesseract_version()
+            return True
+        except Exception as e:
+            print(f"⚠️  Tesseract OCR not available: {e}")
+            return False
+
+    def image_to_data(self, image, psm=3):
+        """
+        Recognize words in a grayscale NumPy image.
+
+        Returns:
+            Dict with text, conf, left, top, width and height (pytesseract layout)
+        """
+        data = pytesseract.image_to_data(
+            image,
+            output_type=pytesseract.Output.DICT,
+            config=f'--psm {psm}'
+        )
+        return {
+            'text': data['text'],
+            'conf': np.asarray(data['conf'], dtype=np.float64),
+            'left': np.asarray(data['left'], dtype=np.int64),
+            'top': np.asarray(data['top'], dtype=np.int64),
+            'width': np.asarray(data['width'], dtype=np.int64),
+            'height': np.asarray(data['height'], dtype=np.int64),
+        }
+
+
+class TesserocrPoolBackend:
+    """
+    OCR through long-lived in-process Tesseract engines (tesserocr C-API binding).
+
+    Engines are created on demand up to pool_size and reused, so the language
+    data is loaded once per engine instead of once per call, and no process,
+    temp file or TSV round trip is involved. tesserocr releases the GIL while
+    recognizing, so engines can run in parallel threads.
+    """
+    name = 'tesserocr'
+
+    def __init__(self, pool_size=None, lang='eng'):
+        import tesserocr  # Raises ImportError when the binding is not installed
+        self._tesserocr = tesserocr
+        self.lang = lang
+        self.pool_size = pool_size or os.cpu_count() or 1
+        self._engines = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def is_available(self):
+        try:
+            engine = self._acquire()
+            self._release(engine)
+            return True
+        except Exception as e:
+            print(f"⚠️  tesserocr engine could not be initialized: {e}")
+            return False
+
+    def _acquire(self):
+        try:
+            return self._engines.get_nowait()
+        except queue.Empty:
+            pass
+        with self._lock:
+            if self._created < self.pool_size:
+                self._created += 1
+                try:
+                    return self._tesserocr.PyTessBaseAPI(lang=self.lang)
+                except Exception:
+                    self._created -= 1
+                    raise
+        return self._engines.get()
+
+    def _release(self, engine):
+        self._engines.put(engine)
+
+    def image_to_data(self, image, psm=3):
+        """
+        Recognize words in a grayscale NumPy image.
+
+        Returns:
+            Dict with text, conf, left, top, width and height (pytesseract layout)
+        """
+        RIL = self._tesserocr.RIL
+        texts, confs, boxes = [], [], []
+
+        engine = self._acquire()
+        try:
+            engine.SetPageSegMode(psm)
+            engine.SetImage(Image.fromarray(image))
+            engine.Recognize()
+            iterator = engine.GetIterator()
+            if iterator is not None:
+                for word in self._tesserocr.iterate_level(iterator, RIL.WORD):
+                    box = word.BoundingBox(RIL.WORD)
+                    if box is None:
+                        continue
+                    texts.append(word.GetUTF8Text(RIL.WORD) or '')
+                    confs.append(word.Confidence(RIL.WORD))
+                    boxes.append(box)
+        finally:
+            engine.Clear()
+            self._release(engine)
+
+        boxes = np.asarray(boxes, dtype=np.int64).reshape(-1, 4)
+        return {
+            'text': texts,
+            'conf': np.asarray(confs, dtype=np.float64),
+            'left': boxes[:, 0],
+            'top': boxes[:, 1],
+            'width': boxes[:, 2] - boxes[:, 0],
+            'height': boxes[:, 3] - boxes[:, 1],
+        }
+
+
+def create_ocr_backend(name=None, pool_size=None):
+    """
+    Create the configured OCR backend.
+
+    Args:
+        name: 'tesserocr', 'pytesseract' or 'auto' (default: OCR_BACKEND env, 'auto').
+              'auto' and 'tesserocr' fall back to pytesseract when the binding is missing.
+        pool_size: Maximum number of pooled tesserocr engines
+
+    Returns:
+        An OCR backend instance
+    """
+    name = (name or os.getenv('OCR_BACKEND', 'auto')).lower()
+    if name in ('auto', 'tesserocr'):
+        try:
+            backend = TesserocrPoolBackend(pool_size=pool_size)
+            if backend.is_available():
+                print("✅ Using pooled in-process Tesseract engines (tesserocr)")
+                return backend
+        except ImportError:
+            if name == 'tesserocr':
+                print("⚠️  tesserocr is not installed, falling back to pytesseract")
+    return PytesseractBackend()
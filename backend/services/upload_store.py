@@ -0,0 +1,85 @@
+import os
+import hashlib
+import tempfile
+from PIL import Image
+from werkzeug.utils import secure_filename
+
+
+class UploadStore:
+    """
+    Content-addressed store for uploaded images.
+
+    Uploads are hashed while they are streamed to disk and stored as
+    <sha256><extension>, with the extension taken from the decoded image
+    format. Identical bytes map to the same file, whatever the client called
+    them, so repeat uploads are neither written nor processed
+    twice. Different images can never overwrite each other, and a stored file
+    never changes while another request is reading it.
+    """
+
+    def __init__(self, upload_folder, chunk_size=1024 * 1024):
+        self.upload_folder = upload_folder
+        self.chunk_size = chunk_size
+        os.makedirs(self.upload_folder, exist_ok=True)
+
+    # PIL format name -> stored extension; other formats use their lowercased name
+    FORMAT_EXTENSIONS = {'PNG': '.png', 'JPEG': '.jpg', 'WEBP': '.webp', 'GIF': '.gif',
+                         'BMP': '.bmp', 'TIFF': '.tiff'}
+
+    def _extension(self, path, filename):
+        """
+        Pick the stored extension from the file's actual format.
+
+        Args:
+            path: Path of the saved upload
+            filename: Client-supplied name, used only if the format is unknown
+
+        Returns:
+            Extension including the dot, e.g. '.png'
+        """
+        try:
+            with Image.open(path) as image:
+                image_format = image.format
+        except Exception:
+            image_format = None
+        if image_format:
+            return self.FORMAT_EXTENSIONS.get(image_format, '.' + image_format.lower())
+        # Not an image PIL can read; analysis will reject it, keep the old naming
+        extension = os.path.splitext(secure_filename(filename or ''))[1].lower()
+        return extension or '.png'
+
+    def save(self, file):
+        """
+        Stream an uploaded file into the store.
+
+        Args:
+            file: werkzeug FileStorage from request.files
+
+        Returns:
+            (filename, content_hash): the stored name inside the upload folder
+            and the SHA-256 hex digest of its bytes
+        """
+        digest = hashlib.sha256()
+        fd, tmp_path = tempfile.mkstemp(dir=self.upload_folder, suffix='.upload')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for chunk in iter(lambda: file.stream.read(self.chunk_size), b''):
+                    digest.update(chunk)
+                    f.write(chunk)
+
+            content_hash = digest.hexdigest()
+            filename = content_hash + self._extension(tmp_path, file.filename)
+            try:
+                # link() never replaces an existing file, so a duplicate keeps the
+                # stored copy (and its mtime, which derived caches are keyed on)
+                os.link(tmp_path, os.path.join(self.upload_folder, filename))
+            except FileExistsError:
+                print(f"📦 Upload {filename} already stored, reusing it")
+            except OSError:
+                # Filesystems without hard links: the same bytes are safe to rename over
+                if not os.path.exists(os.path.join(self.upload_folder, filename)):
+                    os.replace(tmp_path, os.path.join(self.upload_folder, filename))
+            return filename, content_hash
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
@@ -0,0 +1,78 @@
+import numpy as np
+
+
+class WordIndex:
+    """
+    Spatial index over OCR word boxes.
+
+    Word centers are stored in NumPy arrays sorted by their y coordinate, so a
+    rectangle query is a binary search on y followed by a vectorized x filter
+    instead of a Python loop over every word.
+    """
+
+    def __init__(self, text_elements):
+        """
+        Args:
+            text_elements: List of dicts with text, x, y, width, height (pixels)
+        """
+        self.text_elements = list(text_elements)
+        count = len(self.text_elements)
+
+        x = np.fromiter((t['x'] for t in self.text_elements), dtype=np.float64, count=count)
+        y = np.fromiter((t['y'] for t in self.text_elements), dtype=np.float64, count=count)
+        w = np.fromiter((t['width'] for t in self.text_elements), dtype=np.float64, count=count)
+        h = np.fromiter((t['height'] for t in self.text_elements), dtype=np.float64, count=count)
+
+        self.x = x
+        self.y = y
+        center_x = x + w / 2
+        center_y = y + h / 2
+
+        # Stable sort keeps the original order for words sharing a center row
+        self._order = np.argsort(center_y, kind='stable')
+        self._sorted_cy = center_y[self._order]
+        self._sorted_cx = center_x[self._order]
+
+    def __len__(self):
+        return len(self.text_elements)
+
+    def query(self, x, y, width, height):
+        """
+        Find the words whose center lies strictly inside a rectangle.
+
+        Args:
+            x, y, width, height: Rectangle in pixel coordinates
+
+        Returns:
+            NumPy array of word indices in natural reading order (top-to-bottom,
+            left-to-right by box origin)
+        """
+        lo = np.searchsorted(self._sorted_cy, y, side='right')
+        hi = np.searchsorted(self._sorted_cy, y + height, side='left')
+        if hi <= lo:
+            return np.empty(0, dtype=np.intp)
+
+        cx = self._sorted_cx[lo:hi]
+        candidates = self._order[lo:hi][(cx > x) & (cx < x + width)]
+        if candidates.size == 0:
+            return candidates
+
+        # Same ordering as sorting the contained words by (y, x) in Python
+        candidates.sort()
+        return candidates[np.lexsort((self.x[candidates], self.y[candidates]))]
+
+    def words_in(self, x, y, width, height):
+        """Return the text elements whose center lies inside a rectangle, in reading order."""
+        return [self.text_elements[i] for i in self.query(x, y, width, height)]
+
+    def assign(self, blocks):
+        """
+        Assign words to each block.
+
+        Args:
+            blocks: List of dicts with x, y, width, height (pixels)
+
+        Returns:
+            List with one reading-ordered list of text elements per block
+        """
+        return [self.words_in(b['x'], b['y'], b['width'], b['height']) for b in blocks]
@@ -0,0 +1,142 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from collections import OrderedDict
+from services.word_index import WordIndex
+
+
+class WordStore:
+    """
+    Per-upload store of OCR word boxes.
+
+    The analysis step saves every upload's words as a small JSON file in the
+    private data folder (never served, since it holds the page's full text), tagged with the upload's size and mtime so a
+    replaced file is never answered with stale words. Recently used uploads
+    keep a ready WordIndex in memory, so re-mapping text for a new bounding box
+    is a NumPy query instead of another Tesseract run. Entry mtime is refreshed
+    on every lookup; the crop collector expires unused entries via collect().
+    """
+
+    def __init__(self, store_dir=None, max_indexes=None):
+        self.store_dir = store_dir or os.getenv('WORD_STORE_DIR', os.path.join('data', 'words'))
+        self.max_indexes = max_indexes or int(os.getenv('WORD_STORE_MEMORY_ENTRIES', 16))
+        self._indexes = OrderedDict()  # upload path -> (signature, WordIndex)
+        self._lock = threading.Lock()
+        os.makedirs(self.store_dir, exist_ok=True)
+
+    @staticmethod
+    def _signature(image_path):
+        stat = os.stat(image_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _entry_path(self, image_path):
+        return os.path.join(self.store_dir, f"{os.path.basename(image_path)}.json")
+
+    def put(self, image_path, text_elements, image_size=None):
+        """
+        Save the OCR words of an upload and keep their index in memory.
+
+        Args:
+            image_path: Path to the uploaded image the words were read from
+            text_elements: List of dicts with text, x, y, width, height (pixels)
+            image_size: Optional dict with width and height in pixels
+        """
+        try:
+            signature = self._signature(image_path)
+            entry = {'signature': signature, 'image_size': image_size, 'text_elements': text_elements}
+            # Write to a temp file first so a concurrent recrop never reads a partial entry
+            fd, tmp_path = tempfile.mkstemp(dir=self.store_dir, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(entry, f)
+            os.replace(tmp_path, self._entry_path(image_path))
+            self._remember(image_path, signature, WordIndex(text_elements))
+        except Exception as e:
+            print(f"⚠️  Could not store OCR words for {image_path}: {e}")
+
+    def get_index(self, image_path):
+        """
+        Return the WordIndex for an upload.
+
+        Returns:
+            WordIndex, or None when no words are stored or the upload has changed
+            since they were read
+        """
+        try:
+            signature = self._signature(image_path)
+        except OSError:
+            return None
+
+        with self._lock:
+            cached = self._indexes.get(image_path)
+            if cached and cached[0] == signature:
+                self._indexes.move_to_end(image_path)
+                self._touch(image_path)
+                return cached[1]
+
+        try:
+            with open(self._entry_path(image_path), 'r') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Discarding unreadable OCR word store entry for {image_path}: {e}")
+            return None
+        if entry.get('signature') != signature:
+            return None
+
+        index = WordIndex(entry.get('text_elements', []))
+        self._remember(image_path, signature, index)
+        self._touch(image_path)
+        return index
+
+    def _touch(self, image_path):
+        try:
+            os.utime(self._entry_path(image_path), None)  # Mark as recently used
+        except OSError:
+            pass
+
+    def has(self, image_path):
+        """True when current words are stored for an upload."""
+        return self.get_index(image_path) is not None
+
+    def _remember(self, image_path, signature, index):
+        with self._lock:
+            self._indexes[image_path] = (signature, index)
+            self._indexes.move_to_end(image_path)
+            while len(self._indexes) > self.max_indexes:
+                self._indexes.popitem(last=False)
+
+    def remove(self, image_path):
+        """Forget the words stored for an upload (by path or upload filename)."""
+        upload_name = os.path.basename(image_path)
+        with self._lock:
+            for path in [p for p in self._indexes if os.path.basename(p) == upload_name]:
+                del self._indexes[path]
+        try:
+            os.remove(self._entry_path(image_path))
+        except OSError:
+            pass
+
+    def collect(self, max_age_seconds, now=None):
+        """
+        Remove entries not used for longer than max_age_seconds.
+
+        Returns:
+            Number of entries removed
+        """
+        now = now or time.time()
+        removed = 0
+        with os.scandir(self.store_dir) as it:
+            for entry in it:
+                if not entry.name.endswith('.json'):
+                    continue
+                try:
+                    if now - entry.stat().st_mtime <= max_age_seconds:
+                        continue
+                except OSError:
+                    continue
+                self.remove(entry.name[:-len('.json')])
+                removed += 1
+        return removed
@@ -6,6 +6,7 @@ import Image from 'next/image'
 import Snackbar from '../components/Snackbar'
 import Lightbox from '../components/Lightbox'
 import SectionEditor from '../components/SectionEditor'
+import SpritePreview, { SpriteAtlas, SpriteCell } from '../components/SpritePreview'
 import { useSnackbar } from '../hooks/useSnackbar'
 
 interface Brand {
@@ -155,6 +156,9 @@ export default function Home() {
   const [loading, setLoading] = useState(false)
   const [sections, setSections] = useState<Section[]>([])
   const [imagePath, setImagePath] = useState<string>('')
+  const [spriteAtlas, setSpriteAtlas] = useState<SpriteAtlas | null>(null)
+  // Atlas cells keyed by crop_image, so generated copy sections find their preview too
+  const [spriteCells, setSpriteCells] = useState<Record<string, SpriteCell>>({})
   const [showConfirmation, setShowConfirmation] = useState(false)
   const [results, setResults] = useState<any>(null)
   const [showResults, setShowResults] = useState(false)
@@ -405,6 +409,17 @@ export default function Home() {
     if (response.data.success) {
       setSections(response.data.sections)
       setImagePath(response.data.image_path)
+      const atlas: SpriteAtlas | null = response.data.sprite_atlas || null
+      const cells: Record<string, SpriteCell> = {}
+      if (atlas) {
+        response.data.sections.forEach((section: Section) => {
+          if (section.crop_image && atlas.sprites[section.id]) {
+            cells[section.crop_image] = atlas.sprites[section.id]
+          }
+        })
+      }
+      setSpriteAtlas(atlas)
+      setSpriteCells(cells)
       setShowConfirmation(true)
       showInfo(`Found ${response.data.sections.length} sections in your image`)
     } else {
@@ -829,15 +844,31 @@ export default function Home() {
                       <div className="section-copy-item-content">
                         {section.crop_image && (
                           <div className="compact-section-screenshot">
-                            <img 
-                              src={`${API_URL}/uploads/${section.crop_image}`} 
-                              alt={`${section.section_name} screenshot`}
-                              style={{ maxWidth: '200px', maxHeight: '120px', cursor: 'pointer' }}
-                              onClick={() => handleImageClick(
-                                `${API_URL}/uploads/${section.crop_image}`,
-                                `${section.section_name} - ${section.communicates}`
-                              )}
-                            />
+                            {spriteAtlas && spriteCells[section.crop_image] ? (
+                              <SpritePreview
+                                atlasSrc={`${API_URL}/uploads/${spriteAtlas.image}`}
+                                atlas={spriteAtlas}
+                                cell={spriteCells[section.crop_image]}
+                                alt={`${section.section_name} screenshot`}
+                                fallbackSrc={`${API_URL}/uploads/${section.crop_image}?size=256`}
+                                maxWidth={200}
+                                maxHeight={120}
+                                onClick={() => handleImageClick(
+                                  `${API_URL}/uploads/${section.crop_image}`,
+                                  `${section.section_name} - ${section.communicates}`
+                                )}
+                              />
+                            ) : (
+                              <img 
+                                src={`${API_URL}/uploads/${section.crop_image}?size=256`} 
+                                alt={`${section.section_name} screenshot`}
+                                style={{ maxWidth: '200px', maxHeight: '120px', cursor: 'pointer' }}
+                                onClick={() => handleImageClick(
+                                  `${API_URL}/uploads/${section.crop_image}`,
+                                  `${section.section_name} - ${section.communicates}`
+                                )}
+                              />
+                            )}
                           </div>
                         )}
                         <div className="copy-content">
@@ -1370,14 +1401,30 @@ export default function Home() {
                     </div>
                     {section.crop_image && (
                       <div className="section-screenshot">
-                        <img 
-                          src={`${API_URL}/uploads/${section.crop_image}`} 
-                          alt={`${section.id} screenshot`}
-                          onClick={() => handleImageClick(
-                            `${API_URL}/uploads/${section.crop_image}`,
-                            `${section.id} - ${section.location} (${section.type})`
-                          )}
-                        />
+                        {spriteAtlas && spriteCells[section.crop_image] ? (
+                          <SpritePreview
+                            className="sprite-preview"
+                            atlasSrc={`${API_URL}/uploads/${spriteAtlas.image}`}
+                            atlas={spriteAtlas}
+                            cell={spriteCells[section.crop_image]}
+                            alt={`${section.id} screenshot`}
+                            fallbackSrc={`${API_URL}/uploads/${section.crop_image}?size=768`}
+                            maxHeight={250}
+                            onClick={() => handleImageClick(
+                              `${API_URL}/uploads/${section.crop_image}`,
+                              `${section.id} - ${section.location} (${section.type})`
+                            )}
+                          />
+                        ) : (
+                          <img 
+                            src={`${API_URL}/uploads/${section.crop_image}?size=768`} 
+                            alt={`${section.id} screenshot`}
+                            onClick={() => handleImageClick(
+                              `${API_URL}/uploads/${section.crop_image}`,
+                              `${section.id} - ${section.location} (${section.type})`
+                            )}
+                          />
+                        )}
                         <div className="section-screenshot-label">
                           <i className="fas fa-expand"></i>
                           Click to view full size
@@ -0,0 +1,104 @@
+'use client'
+
+import React, { useEffect, useState } from 'react'
+
+export interface SpriteCell {
+  x: number
+  y: number
+  width: number
+  height: number
+}
+
+export interface SpriteAtlas {
+  image: string
+  width: number
+  height: number
+  sprites: Record<string, SpriteCell>
+}
+
+interface SpritePreviewProps {
+  atlasSrc: string
+  atlas: SpriteAtlas
+  cell: SpriteCell
+  alt: string
+  // Per-section image shown instead if the atlas cannot be loaded
+  fallbackSrc?: string
+  className?: string
+  maxWidth?: number
+  maxHeight?: number
+  onClick?: () => void
+}
+
+// Shows one section preview out of the upload's sprite atlas, so every preview
+// on the page shares a single request and a single decoded bitmap
+const SpritePreview: React.FC<SpritePreviewProps> = ({
+  atlasSrc,
+  atlas,
+  cell,
+  alt,
+  fallbackSrc,
+  className,
+  maxWidth,
+  maxHeight,
+  onClick
+}) => {
+  const [atlasFailed, setAtlasFailed] = useState(false)
+
+  // CSS backgrounds report no load errors, so probe the atlas (the browser
+  // shares the request and the cache with the background image)
+  useEffect(() => {
+    setAtlasFailed(false)
+    const probe = new window.Image()
+    probe.onerror = () => setAtlasFailed(true)
+    probe.src = atlasSrc
+    return () => {
+      probe.onerror = null
+    }
+  }, [atlasSrc])
+
+  if (atlasFailed && fallbackSrc) {
+    return (
+      <img
+        src={fallbackSrc}
+        alt={alt}
+        className={className}
+        onClick={onClick}
+        style={{
+          maxWidth: maxWidth ? `${maxWidth}px` : undefined,
+          maxHeight: maxHeight ? `${maxHeight}px` : undefined,
+          cursor: onClick ? 'pointer' : undefined
+        }}
+      />
+    )
+  }
+
+  const displayWidth = Math.min(
+    cell.width,
+    maxWidth ?? Infinity,
+    maxHeight ? (maxHeight * cell.width) / cell.height : Infinity
+  )
+  // Percentages keep the cell aligned however the preview is scaled
+  const positionX = atlas.width > cell.width ? (cell.x / (atlas.width - cell.width)) * 100 : 0
+  const positionY = atlas.height > cell.height ? (cell.y / (atlas.height - cell.height)) * 100 : 0
+
+  return (
+    <div
+      role="img"
+      aria-label={alt}
+      className={className}
+      onClick={onClick}
+      style={{
+        width: `${displayWidth}px`,
+        maxWidth: '100%',
+        aspectRatio: `${cell.width} / ${cell.height}`,
+        backgroundImage: `url(${atlasSrc})`,
+        backgroundSize: `${(atlas.width / cell.width) * 100}% ${(atlas.height / cell.height) * 100}%`,
+        backgroundPosition: `${positionX}% ${positionY}%`,
+        backgroundRepeat: 'no-repeat',
+        cursor: onClick ? 'pointer' : undefined
+      }}
+    />
+  )
+}
+
+export default SpritePreview